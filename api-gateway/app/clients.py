@@ -1,10 +1,18 @@
 import grpc
 import logging
-from typing import List, Optional
+import os
+from datetime import datetime
+from typing import (
+    AsyncIterable, AsyncIterator, Iterable, List, Optional, Tuple, Union
+)
+
+from google.protobuf import empty_pb2
+from google.protobuf.timestamp_pb2 import Timestamp
 
 from proto_gen.product_pb2 import (
     GetProductRequest,
     CreateProductRequest,
+    RestockProductRequest,
     ListProductsResponse
 )
 from proto_gen.product_pb2_grpc import ProductServiceStub
@@ -12,25 +20,41 @@ from proto_gen.product_pb2_grpc import ProductServiceStub
 from proto_gen.order_pb2 import (
     GetOrderRequest,
     CreateOrderRequest,
-    ListOrdersResponse
+    ListOrdersRequest,
+    ListOrdersResponse,
+    AggregateOrdersRequest,
+    PlaceOrderRequest,
+    TimeBucket
 )
 from proto_gen.order_pb2_grpc import OrderServiceStub
 
-from .models import Product, Order, ProductCreate, OrderCreate
+from .models import (
+    Product, Order, ProductCreate, OrderCreate, OrderAggregate, OrderPlacement
+)
 
 logger = logging.getLogger(__name__)
 
+TIME_BUCKETS = {
+    None: TimeBucket.TIME_BUCKET_NONE,
+    "hour": TimeBucket.TIME_BUCKET_HOUR,
+    "day": TimeBucket.TIME_BUCKET_DAY,
+    "month": TimeBucket.TIME_BUCKET_MONTH,
+}
+
+# gRPC targets for the backend services; accept "host:port" or "unix:/path"
+PRODUCT_SERVICE_TARGET = os.getenv("PRODUCT_SERVICE_TARGET", "product-service:50051")
+ORDER_SERVICE_TARGET = os.getenv("ORDER_SERVICE_TARGET", "order-service:50052")
+
 
 class ProductServiceClient:
-    def __init__(self, host: str = "product-service", port: int = 50051):
-        self.host = host
-        self.port = port
+    def __init__(self, target: Optional[str] = None):
+        self.target = target or PRODUCT_SERVICE_TARGET
         self.channel = None
         self.stub = None
 
     async def __aenter__(self):
         """Async context manager entry"""
-        self.channel = grpc.aio.insecure_channel(f"{self.host}:{self.port}")
+        self.channel = grpc.aio.insecure_channel(self.target)
         self.stub = ProductServiceStub(self.channel)
         return self
 
@@ -42,7 +66,6 @@ class ProductServiceClient:
     async def list_products(self) -> List[Product]:
         """List all products"""
         try:
-            from google.protobuf import empty_pb2
             response: ListProductsResponse = await self.stub.ListProducts(empty_pb2.Empty())
 
             products = []
@@ -51,7 +74,8 @@ class ProductServiceClient:
                     id=proto_product.id,
                     name=proto_product.name,
                     description=proto_product.description,
-                    price=proto_product.price
+                    price=proto_product.price,
+                    stock=proto_product.stock
                 )
                 products.append(product)
             return products
@@ -74,7 +98,8 @@ class ProductServiceClient:
                     id=response.id,
                     name=response.name,
                     description=response.description,
-                    price=response.price
+                    price=response.price,
+                    stock=response.stock
                 )
             return None
 
@@ -91,7 +116,8 @@ class ProductServiceClient:
             request = CreateProductRequest(
                 name=product_data.name,
                 description=product_data.description,
-                price=product_data.price
+                price=product_data.price,
+                stock=product_data.stock
             )
             response = await self.stub.CreateProduct(request)
 
@@ -99,7 +125,8 @@ class ProductServiceClient:
                 id=response.id,
                 name=response.name,
                 description=response.description,
-                price=response.price
+                price=response.price,
+                stock=response.stock
             )
 
         except grpc.RpcError as e:
@@ -109,17 +136,37 @@ class ProductServiceClient:
             logger.error(f"Error creating product: {e}")
             raise
 
+    async def restock_product(self, product_id: str, quantity: int) -> Product:
+        """Add units to a product's stock"""
+        try:
+            request = RestockProductRequest(id=product_id, quantity=quantity)
+            response = await self.stub.RestockProduct(request)
+
+            return Product(
+                id=response.id,
+                name=response.name,
+                description=response.description,
+                price=response.price,
+                stock=response.stock
+            )
+
+        except grpc.RpcError as e:
+            logger.error(f"gRPC error restocking product {product_id}: {e}")
+            raise
+        except Exception as e:
+            logger.error(f"Error restocking product {product_id}: {e}")
+            raise
+
 
 class OrderServiceClient:
-    def __init__(self, host: str = "order-service", port: int = 50052):
-        self.host = host
-        self.port = port
+    def __init__(self, target: Optional[str] = None):
+        self.target = target or ORDER_SERVICE_TARGET
         self.channel = None
         self.stub = None
 
     async def __aenter__(self):
         """Async context manager entry"""
-        self.channel = grpc.aio.insecure_channel(f"{self.host}:{self.port}")
+        self.channel = grpc.aio.insecure_channel(self.target)
         self.stub = OrderServiceStub(self.channel)
         return self
 
@@ -128,22 +175,29 @@ class OrderServiceClient:
         if self.channel:
             await self.channel.close()
 
-    async def list_orders(self) -> List[Order]:
-        """List all orders"""
+    async def list_orders(
+        self,
+        product_id: Optional[str] = None,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        page_size: int = 0,
+        page_token: Optional[str] = None
+    ) -> Tuple[List[Order], Optional[str]]:
+        """List orders; returns the page and the next page token"""
         try:
-            from google.protobuf import empty_pb2
-            response: ListOrdersResponse = await self.stub.ListOrders(empty_pb2.Empty())
-
-            orders = []
-            for proto_order in response.orders:
-                order = Order(
-                    id=proto_order.id,
-                    product_id=proto_order.product_id,
-                    quantity=proto_order.quantity,
-                    total_price=proto_order.total_price
-                )
-                orders.append(order)
-            return orders
+            request = ListOrdersRequest(
+                product_id=product_id or "",
+                page_size=page_size,
+                page_token=page_token or ""
+            )
+            if start is not None:
+                request.start_time.CopyFrom(_to_timestamp(start))
+            if end is not None:
+                request.end_time.CopyFrom(_to_timestamp(end))
+            response: ListOrdersResponse = await self.stub.ListOrders(request)
+
+            orders = [_to_order(proto_order) for proto_order in response.orders]
+            return orders, response.next_page_token or None
 
         except grpc.RpcError as e:
             logger.error(f"gRPC error listing orders: {e}")
@@ -159,12 +213,7 @@ class OrderServiceClient:
             response = await self.stub.GetOrder(request)
 
             if response.id:  # Order exists
-                return Order(
-                    id=response.id,
-                    product_id=response.product_id,
-                    quantity=response.quantity,
-                    total_price=response.total_price
-                )
+                return _to_order(response)
             return None
 
         except grpc.RpcError as e:
@@ -183,12 +232,7 @@ class OrderServiceClient:
             )
             response = await self.stub.CreateOrder(request)
 
-            return Order(
-                id=response.id,
-                product_id=response.product_id,
-                quantity=response.quantity,
-                total_price=response.total_price
-            )
+            return _to_order(response)
 
         except grpc.RpcError as e:
             logger.error(f"gRPC error creating order: {e}")
@@ -196,3 +240,122 @@ class OrderServiceClient:
         except Exception as e:
             logger.error(f"Error creating order: {e}")
             raise
+
+    async def aggregate_orders(
+        self,
+        group_by_product: bool = False,
+        bucket: Optional[str] = None,
+        product_ids: Optional[List[str]] = None,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        use_rollup: bool = False
+    ) -> List[OrderAggregate]:
+        """Aggregate orders on the order service"""
+        try:
+            request = AggregateOrdersRequest(
+                group_by_product=group_by_product,
+                time_bucket=TIME_BUCKETS[bucket],
+                product_ids=product_ids or [],
+                use_rollup=use_rollup
+            )
+            if start is not None:
+                request.start_time.CopyFrom(_to_timestamp(start))
+            if end is not None:
+                request.end_time.CopyFrom(_to_timestamp(end))
+            response = await self.stub.AggregateOrders(request)
+
+            aggregates = []
+            for proto_aggregate in response.aggregates:
+                aggregate = OrderAggregate(
+                    product_id=proto_aggregate.product_id or None,
+                    bucket=proto_aggregate.bucket or None,
+                    order_count=proto_aggregate.order_count,
+                    total_quantity=proto_aggregate.total_quantity,
+                    total_revenue=proto_aggregate.total_revenue
+                )
+                aggregates.append(aggregate)
+            return aggregates
+
+        except grpc.RpcError as e:
+            logger.error(f"gRPC error aggregating orders: {e}")
+            raise
+        except Exception as e:
+            logger.error(f"Error aggregating orders: {e}")
+            raise
+
+    async def place_orders(
+        self,
+        orders: Union[Iterable[OrderCreate], AsyncIterable[OrderCreate]]
+    ) -> AsyncIterator[OrderPlacement]:
+        """Stream orders over PlaceOrders, yielding results as they complete.
+
+        Each result's request_id is the position of its order in `orders`.
+        Results may arrive out of order; the server's in-flight window
+        throttles how fast `orders` is consumed. Closing the generator early
+        (e.g. via contextlib.aclosing) cancels the call, so the server stops
+        placing orders that nobody will see.
+        """
+        async def requests():
+            index = 0
+            if isinstance(orders, AsyncIterable):
+                async for order in orders:
+                    yield _to_place_order_request(index, order)
+                    index += 1
+            else:
+                for order in orders:
+                    yield _to_place_order_request(index, order)
+                    index += 1
+
+        call = self.stub.PlaceOrders(requests())
+        try:
+            async for result in call:
+                if result.code == grpc.StatusCode.OK.value[0]:
+                    yield OrderPlacement(
+                        request_id=result.request_id,
+                        order=_to_order(result.order)
+                    )
+                else:
+                    yield OrderPlacement(
+                        request_id=result.request_id,
+                        code=result.code,
+                        error=result.message
+                    )
+
+        except grpc.RpcError as e:
+            logger.error(f"gRPC error placing orders: {e}")
+            raise
+        except Exception as e:
+            logger.error(f"Error placing orders: {e}")
+            raise
+        finally:
+            # No-op once the stream has completed
+            call.cancel()
+
+
+def _to_timestamp(value: datetime) -> Timestamp:
+    """Convert a (naive UTC or aware) datetime to a protobuf Timestamp"""
+    timestamp = Timestamp()
+    timestamp.FromDatetime(value)
+    return timestamp
+
+
+def _to_order(proto_order) -> Order:
+    """Convert an order message to the REST model"""
+    return Order(
+        id=proto_order.id,
+        product_id=proto_order.product_id,
+        quantity=proto_order.quantity,
+        total_price=proto_order.total_price,
+        created_at=(
+            proto_order.created_at.ToDatetime()
+            if proto_order.HasField("created_at") else None
+        )
+    )
+
+
+def _to_place_order_request(index: int, order: OrderCreate) -> PlaceOrderRequest:
+    return PlaceOrderRequest(
+        request_id=str(index),
+        product_id=order.product_id,
+        quantity=order.quantity
+    )
@@ -1,8 +1,14 @@
-from fastapi import FastAPI, HTTPException
-from typing import List
+from fastapi import FastAPI, HTTPException, Query
+import grpc
+from datetime import datetime
+from typing import List, Literal, Optional
 import logging
+import os
 
-from .models import Product, Order, ProductCreate, OrderCreate, ProductList, OrderList
+from .models import (
+    Product, Order, ProductCreate, ProductRestock, OrderCreate, ProductList,
+    OrderList, OrderAggregateList
+)
 from .clients import ProductServiceClient, OrderServiceClient
 
 # Configure logging
@@ -35,6 +41,11 @@ async def create_product(product: ProductCreate):
         async with ProductServiceClient() as client:
             created_product = await client.create_product(product)
             return created_product
+    except grpc.RpcError as e:
+        if e.code() == grpc.StatusCode.INVALID_ARGUMENT:
+            raise HTTPException(status_code=400, detail="Invalid product data")
+        logger.error(f"Error creating product: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
     except Exception as e:
         logger.error(f"Error creating product: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
@@ -56,13 +67,49 @@ async def get_product(product_id: str):
         raise HTTPException(status_code=500, detail="Internal server error")
 
 
+@app.post("/products/{product_id}/restock", response_model=Product)
+async def restock_product(product_id: str, restock: ProductRestock):
+    """Add units to a product's stock"""
+    try:
+        async with ProductServiceClient() as client:
+            product = await client.restock_product(product_id, restock.quantity)
+            return product
+    except grpc.RpcError as e:
+        if e.code() == grpc.StatusCode.NOT_FOUND:
+            raise HTTPException(status_code=404, detail="Product not found")
+        if e.code() == grpc.StatusCode.INVALID_ARGUMENT:
+            raise HTTPException(status_code=400, detail="Invalid restock quantity")
+        logger.error(f"Error restocking product {product_id}: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+    except Exception as e:
+        logger.error(f"Error restocking product {product_id}: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+
 @app.get("/orders", response_model=OrderList)
-async def list_orders():
-    """List all orders"""
+async def list_orders(
+    product_id: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    page_size: int = Query(default=0, ge=0, le=1000),
+    page_token: Optional[str] = None
+):
+    """List orders, optionally filtered by product and creation time"""
     try:
         async with OrderServiceClient() as client:
-            orders = await client.list_orders()
-            return OrderList(orders=orders)
+            orders, next_page_token = await client.list_orders(
+                product_id=product_id,
+                start=start,
+                end=end,
+                page_size=page_size,
+                page_token=page_token
+            )
+            return OrderList(orders=orders, next_page_token=next_page_token)
+    except grpc.RpcError as e:
+        if e.code() == grpc.StatusCode.INVALID_ARGUMENT:
+            raise HTTPException(status_code=400, detail=e.details())
+        logger.error(f"Error listing orders: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
     except Exception as e:
         logger.error(f"Error listing orders: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
@@ -75,11 +122,53 @@ async def create_order(order: OrderCreate):
         async with OrderServiceClient() as client:
             created_order = await client.create_order(order)
             return created_order
+    except grpc.RpcError as e:
+        if e.code() == grpc.StatusCode.NOT_FOUND:
+            raise HTTPException(status_code=404, detail="Product not found")
+        if e.code() == grpc.StatusCode.FAILED_PRECONDITION:
+            raise HTTPException(status_code=409, detail="Insufficient stock")
+        if e.code() == grpc.StatusCode.INVALID_ARGUMENT:
+            raise HTTPException(status_code=400, detail="Invalid order data")
+        logger.error(f"Error creating order: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
     except Exception as e:
         logger.error(f"Error creating order: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
 
+@app.get("/orders/aggregate", response_model=OrderAggregateList)
+async def aggregate_orders(
+    group_by_product: bool = False,
+    bucket: Optional[Literal["hour", "day", "month"]] = None,
+    product_id: Optional[List[str]] = Query(default=None),
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    use_rollup: bool = False
+):
+    """Order counts, units sold and revenue, aggregated by the order service"""
+    try:
+        async with OrderServiceClient() as client:
+            aggregates = await client.aggregate_orders(
+                group_by_product=group_by_product,
+                bucket=bucket,
+                product_ids=product_id,
+                start=start,
+                end=end,
+                use_rollup=use_rollup
+            )
+            return OrderAggregateList(aggregates=aggregates)
+    except grpc.RpcError as e:
+        if e.code() == grpc.StatusCode.INVALID_ARGUMENT:
+            raise HTTPException(status_code=400, detail=e.details())
+        if e.code() == grpc.StatusCode.FAILED_PRECONDITION:
+            raise HTTPException(status_code=409, detail=e.details())
+        logger.error(f"Error aggregating orders: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+    except Exception as e:
+        logger.error(f"Error aggregating orders: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+
 @app.get("/orders/{order_id}", response_model=Order)
 async def get_order(order_id: str):
     """Get a specific order by ID"""
@@ -100,3 +189,31 @@ async def get_order(order_id: str):
 async def health_check():
     """Health check endpoint"""
     return {"status": "healthy", "service": "api-gateway"}
+
+
+# Cold-start budget (interpreter start to app ready) checked by --profile-startup
+STARTUP_TARGET_SECONDS = float(os.getenv("STARTUP_TARGET_SECONDS", "1.0"))
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(description="API gateway")
+    parser.add_argument(
+        "--profile-startup",
+        action="store_true",
+        help="measure a cold start and print the import-time breakdown per module"
+    )
+    args = parser.parse_args()
+
+    if args.profile_startup:
+        from .startup import profile_startup
+
+        sys.exit(profile_startup(
+            ["-c", "import app.main; from app.startup import report_ready; report_ready()"],
+            STARTUP_TARGET_SECONDS,
+        ))
+
+    import uvicorn
+    uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -1,4 +1,5 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+from datetime import datetime
 from typing import List, Optional
 
 
@@ -6,12 +7,17 @@ class ProductBase(BaseModel):
     name: str
     description: str
     price: float
+    stock: int = Field(default=0, ge=0)
 
 
 class ProductCreate(ProductBase):
     pass
 
 
+class ProductRestock(BaseModel):
+    quantity: int = Field(gt=0)
+
+
 class Product(ProductBase):
     id: str
 
@@ -31,14 +37,35 @@ class OrderCreate(OrderBase):
 class Order(OrderBase):
     id: str
     total_price: float
+    created_at: Optional[datetime] = None
 
     class Config:
         from_attributes = True
 
 
+class OrderPlacement(BaseModel):
+    request_id: str
+    order: Optional[Order] = None
+    code: int = 0
+    error: Optional[str] = None
+
+
 class ProductList(BaseModel):
     products: List[Product]
 
 
 class OrderList(BaseModel):
     orders: List[Order]
+    next_page_token: Optional[str] = None
+
+
+class OrderAggregate(BaseModel):
+    product_id: Optional[str] = None
+    bucket: Optional[str] = None
+    order_count: int
+    total_quantity: int
+    total_revenue: float
+
+
+class OrderAggregateList(BaseModel):
+    aggregates: List[OrderAggregate]
@@ -0,0 +1,207 @@
+import logging
+import os
+from datetime import datetime
+from typing import Iterable, Optional
+
+from sqlalchemy import delete, func, insert, text, update
+from sqlmodel import select
+
+from proto_gen.order_pb2 import TimeBucket
+from .models import Order, OrderRollup, OrderRollupState
+from .database import engine
+
+logger = logging.getLogger(__name__)
+
+# Maintain the per-product rollup table on every order insert
+ROLLUP_ENABLED = os.getenv("ORDER_ROLLUP_ENABLED", "true").lower() == "true"
+
+# Bucket label formats, identical across dialects so callers can compare them
+_SQLITE_BUCKET_FORMATS = {
+    TimeBucket.TIME_BUCKET_HOUR: "%Y-%m-%dT%H:00:00",
+    TimeBucket.TIME_BUCKET_DAY: "%Y-%m-%d",
+    TimeBucket.TIME_BUCKET_MONTH: "%Y-%m",
+}
+_POSTGRES_BUCKETS = {
+    TimeBucket.TIME_BUCKET_HOUR: ("hour", 'YYYY-MM-DD"T"HH24:00:00'),
+    TimeBucket.TIME_BUCKET_DAY: ("day", "YYYY-MM-DD"),
+    TimeBucket.TIME_BUCKET_MONTH: ("month", "YYYY-MM"),
+}
+
+
+def bucket_expression(bucket: int):
+    """SQL expression labelling each order with its time bucket, or None"""
+    if bucket == TimeBucket.TIME_BUCKET_NONE:
+        return None
+    if engine.dialect.name == "postgresql":
+        unit, fmt = _POSTGRES_BUCKETS[bucket]
+        return func.to_char(func.date_trunc(unit, Order.created_at), fmt)
+    return func.strftime(_SQLITE_BUCKET_FORMATS[bucket], Order.created_at)
+
+
+def aggregate_query(
+    group_by_product: bool,
+    bucket: int,
+    product_ids: Iterable[str] = (),
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None,
+):
+    """Build the GROUP BY query for AggregateOrders"""
+    group_by = []
+    columns = []
+    if group_by_product:
+        group_by.append(Order.product_id)
+        columns.append(Order.product_id)
+    bucket_column = bucket_expression(bucket)
+    if bucket_column is not None:
+        group_by.append(bucket_column)
+        columns.append(bucket_column.label("bucket"))
+
+    statement = select(
+        *columns,
+        func.count().label("order_count"),
+        func.coalesce(func.sum(Order.quantity), 0).label("total_quantity"),
+        func.coalesce(func.sum(Order.total_price), 0.0).label("total_revenue"),
+    )
+
+    product_ids = list(product_ids)
+    if product_ids:
+        statement = statement.where(Order.product_id.in_(product_ids))
+    if start_time is not None:
+        statement = statement.where(Order.created_at >= start_time)
+    if end_time is not None:
+        statement = statement.where(Order.created_at < end_time)
+
+    if group_by:
+        statement = statement.group_by(*group_by).order_by(*group_by)
+    return statement
+
+
+def rollup_query(product_ids: Iterable[str] = ()):
+    """Read precomputed per-product totals from the rollup table"""
+    statement = select(OrderRollup).order_by(OrderRollup.product_id)
+    product_ids = list(product_ids)
+    if product_ids:
+        statement = statement.where(OrderRollup.product_id.in_(product_ids))
+    return statement
+
+
+def _upsert():
+    if engine.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    return dialect_insert(OrderRollup)
+
+
+async def record_orders(session, orders: Iterable[Order]):
+    """Add orders to the rollup within the caller's transaction"""
+    totals = {}
+    for order in orders:
+        count, quantity, revenue = totals.get(order.product_id, (0, 0, 0.0))
+        totals[order.product_id] = (
+            count + 1, quantity + order.quantity, revenue + order.total_price
+        )
+
+    # One upsert per distinct product, in a fixed order to avoid deadlocks
+    for product_id in sorted(totals):
+        count, quantity, revenue = totals[product_id]
+        statement = _upsert().values(
+            product_id=product_id,
+            order_count=count,
+            total_quantity=quantity,
+            total_revenue=revenue,
+        )
+        statement = statement.on_conflict_do_update(
+            index_elements=[OrderRollup.product_id],
+            set_={
+                "order_count": OrderRollup.order_count + statement.excluded.order_count,
+                "total_quantity": OrderRollup.total_quantity + statement.excluded.total_quantity,
+                "total_revenue": OrderRollup.total_revenue + statement.excluded.total_revenue,
+            },
+        )
+        await session.execute(statement)
+
+
+async def invalidate_rollup(session):
+    """Mark the rollup stale within the caller's transaction.
+
+    Only matches while the rollup is marked valid, so after the first insert
+    following a rebuild it neither writes nor locks the state row.
+    """
+    await session.execute(
+        update(OrderRollupState)
+        .where(OrderRollupState.id == 1, OrderRollupState.valid)
+        .values(valid=False, updated_at=datetime.utcnow())
+    )
+
+
+async def track_orders(session, orders: Iterable[Order]):
+    """Account for orders inserted in the caller's transaction.
+
+    With ROLLUP_ENABLED they are added to the rollup; otherwise the rollup
+    is marked stale, including after another replica has rebuilt it.
+    """
+    if ROLLUP_ENABLED:
+        await record_orders(session, orders)
+    else:
+        await invalidate_rollup(session)
+
+
+async def rollup_is_valid(session) -> bool:
+    """Whether every order written so far is counted in the rollup"""
+    result = await session.execute(
+        select(OrderRollupState.valid).where(OrderRollupState.id == 1)
+    )
+    return bool(result.scalar_one_or_none())
+
+
+async def _set_rollup_valid(conn, valid: bool):
+    await conn.execute(delete(OrderRollupState))
+    await conn.execute(insert(OrderRollupState).values(
+        id=1, valid=valid, updated_at=datetime.utcnow()
+    ))
+
+
+async def rebuild_rollup(conn):
+    """Recompute the rollup from the order table"""
+    if conn.dialect.name == "postgresql":
+        # Concurrent inserts from other replicas wait on their rollup upsert,
+        # or on invalidate_rollup when the rollup is disabled for them, until
+        # the rebuild commits, so none is lost, counted twice or left unflagged
+        await conn.execute(text(
+            f"LOCK TABLE {OrderRollup.__tablename__}, "
+            f"{OrderRollupState.__tablename__} IN EXCLUSIVE MODE"
+        ))
+    await conn.execute(delete(OrderRollup))
+    await conn.execute(
+        insert(OrderRollup).from_select(
+            ["product_id", "order_count", "total_quantity", "total_revenue"],
+            select(
+                Order.product_id,
+                func.count(),
+                func.sum(Order.quantity),
+                func.sum(Order.total_price),
+            ).group_by(Order.product_id),
+        )
+    )
+    await _set_rollup_valid(conn, True)
+
+
+async def sync_rollup(conn):
+    """Startup check of the rollup against ROLLUP_ENABLED.
+
+    A replica running with the rollup disabled inserts orders without
+    updating it, so it marks the rollup invalid here and again with every
+    insert (see track_orders); reads reject use_rollup until a replica with
+    the rollup enabled starts and rebuilds it.
+    """
+    if not ROLLUP_ENABLED:
+        await _set_rollup_valid(conn, False)
+        return
+
+    result = await conn.execute(
+        select(OrderRollupState.valid).where(OrderRollupState.id == 1)
+    )
+    if not result.scalar_one_or_none():
+        logger.info("Rebuilding order rollup")
+        await rebuild_rollup(conn)
@@ -1,23 +1,32 @@
 import grpc
 import logging
-from typing import Optional
+import os
+from typing import Dict, List, Optional, Tuple
 
-from proto_gen.product_pb2 import GetProductRequest
+from proto_gen.product_pb2 import (
+    GetProductRequest,
+    ReserveStockRequest,
+    ReleaseStockRequest,
+    StockItem,
+)
 from proto_gen.product_pb2_grpc import ProductServiceStub
 
 logger = logging.getLogger(__name__)
 
+# gRPC target for product-service, e.g. "product-service:50051" or
+# "unix:/var/run/ecommerce/product.sock" when running on the same host
+PRODUCT_SERVICE_TARGET = os.getenv("PRODUCT_SERVICE_TARGET", "product-service:50051")
+
 
 class ProductServiceClient:
-    def __init__(self, host: str = "product-service", port: int = 50051):
-        self.host = host
-        self.port = port
+    def __init__(self, target: Optional[str] = None):
+        self.target = target or PRODUCT_SERVICE_TARGET
         self.channel = None
         self.stub = None
 
     async def __aenter__(self):
         """Async context manager entry"""
-        self.channel = grpc.aio.insecure_channel(f"{self.host}:{self.port}")
+        self.channel = grpc.aio.insecure_channel(self.target)
         self.stub = ProductServiceStub(self.channel)
         return self
 
@@ -48,3 +57,52 @@ class ProductServiceClient:
         except Exception as e:
             logger.error(f"Error getting product {product_id}: {e}")
             return None
+
+    async def reserve_stock(
+        self, items: List[Tuple[str, int]], partial: bool = False
+    ) -> List[Dict]:
+        """Reserve stock for (product_id, quantity) pairs in one atomic call.
+
+        Raises grpc.RpcError with NOT_FOUND or FAILED_PRECONDITION when a
+        product is missing or out of stock, so callers can report why.
+        With partial=True each pair is reserved on its own instead and the
+        result for each, in order, carries its status in "code"/"message".
+        """
+        request = ReserveStockRequest(
+            items=[
+                StockItem(product_id=product_id, quantity=quantity)
+                for product_id, quantity in items
+            ],
+            partial=partial
+        )
+        response = await self.stub.ReserveStock(request)
+        return [
+            {
+                "product_id": item.product_id,
+                "quantity": item.quantity,
+                "price": item.price,
+                "remaining_stock": item.remaining_stock,
+                "code": item.code,
+                "message": item.message
+            }
+            for item in response.items
+        ]
+
+    async def release_stock(self, items: List[Tuple[str, int]]) -> bool:
+        """Release previously reserved stock; returns False on failure"""
+        if not items:
+            return True
+        try:
+            request = ReleaseStockRequest(items=[
+                StockItem(product_id=product_id, quantity=quantity)
+                for product_id, quantity in items
+            ])
+            await self.stub.ReleaseStock(request)
+            return True
+
+        except grpc.RpcError as e:
+            logger.error(f"gRPC error releasing stock {items}: {e}")
+            return False
+        except Exception as e:
+            logger.error(f"Error releasing stock {items}: {e}")
+            return False
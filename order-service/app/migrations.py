@@ -0,0 +1,135 @@
+"""Versioned schema migrations, applied in order at startup.
+
+Each migration runs once and is recorded in the schema_migrations table.
+Migrations must be idempotent: databases created before versioning was
+introduced have no schema_migrations table and replay every step.
+
+Run standalone with: python -m app.migrations
+"""
+import asyncio
+import logging
+from datetime import datetime
+from typing import Callable, List, Sequence, Tuple
+
+from sqlalchemy import (
+    Column, DateTime, Index, Integer, MetaData, String, Table,
+    inspect, select, text, update
+)
+from sqlalchemy.engine import Connection
+from sqlmodel import SQLModel
+
+logger = logging.getLogger(__name__)
+
+# Arbitrary key for the PostgreSQL advisory lock that serializes replicas
+_MIGRATION_LOCK_ID = 50052
+
+_migration_metadata = MetaData()
+
+schema_migrations = Table(
+    "schema_migrations",
+    _migration_metadata,
+    Column("version", Integer, primary_key=True),
+    Column("description", String, nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+
+def _quote(conn: Connection, name: str) -> str:
+    return conn.dialect.identifier_preparer.quote(name)
+
+
+def _has_column(conn: Connection, table: str, column: str) -> bool:
+    return column in {c["name"] for c in inspect(conn).get_columns(table)}
+
+
+def _has_index(conn: Connection, table: str, name: str) -> bool:
+    return name in {i["name"] for i in inspect(conn).get_indexes(table)}
+
+
+def _create_index(conn: Connection, name: str, table: str, columns: Sequence[str]):
+    if not _has_index(conn, table, name):
+        table_obj = Table(table, MetaData(), autoload_with=conn)
+        Index(name, *(table_obj.c[column] for column in columns)).create(conn)
+
+
+def _drop_index(conn: Connection, name: str, table: str):
+    if _has_index(conn, table, name):
+        conn.execute(text(f"DROP INDEX {_quote(conn, name)}"))
+
+
+def _create_tables(conn: Connection):
+    # Register all models before creating their tables
+    from .models import Order, OrderRollup, OrderRollupState
+    SQLModel.metadata.create_all(conn)
+
+
+def _add_order_created_at(conn: Connection):
+    if not _has_column(conn, "order", "created_at"):
+        # Nullable first: SQLite can't add a column with a non-constant default
+        conn.execute(text(f"ALTER TABLE {_quote(conn, 'order')} ADD COLUMN created_at TIMESTAMP"))
+        _backfill_order_created_at(conn)
+    _create_index(conn, "ix_order_created_at", "order", ["created_at"])
+
+
+def _backfill_order_created_at(conn: Connection):
+    # A bound datetime is stored exactly like the ORM stores it (SQLite
+    # compares them as text, so CURRENT_TIMESTAMP's format would break the
+    # keyset cursor). Backfilled rows share one timestamp and page by id.
+    order = Table("order", MetaData(), autoload_with=conn)
+    conn.execute(
+        update(order)
+        .where(order.c.created_at.is_(None))
+        .values(created_at=datetime.utcnow())
+    )
+
+
+def _add_order_product_created_index(conn: Connection):
+    _create_index(
+        conn, "ix_order_product_id_created_at", "order", ["product_id", "created_at"]
+    )
+    # Leading column of the composite index makes this one redundant
+    _drop_index(conn, "ix_order_product_id", "order")
+
+
+def _add_order_rollup_state(conn: Connection):
+    from .models import OrderRollupState
+    OrderRollupState.__table__.create(conn, checkfirst=True)
+
+
+MIGRATIONS: List[Tuple[int, str, Callable[[Connection], None]]] = [
+    (1, "create tables", _create_tables),
+    (2, "add order.created_at", _add_order_created_at),
+    (3, "index order (product_id, created_at)", _add_order_product_created_index),
+    (4, "add order rollup state", _add_order_rollup_state),
+]
+
+
+def _apply_migrations(conn: Connection):
+    if conn.dialect.name == "postgresql":
+        conn.execute(text(f"SELECT pg_advisory_xact_lock({_MIGRATION_LOCK_ID})"))
+
+    _migration_metadata.create_all(conn)
+    applied = set(conn.execute(select(schema_migrations.c.version)).scalars())
+
+    for version, description, migrate in MIGRATIONS:
+        if version in applied:
+            continue
+        logger.info(f"Applying migration {version}: {description}")
+        migrate(conn)
+        conn.execute(schema_migrations.insert().values(
+            version=version,
+            description=description,
+            applied_at=datetime.utcnow(),
+        ))
+
+
+async def run_migrations(conn):
+    """Apply pending migrations on an async connection, in one transaction"""
+    await conn.run_sync(_apply_migrations)
+
+
+if __name__ == '__main__':
+    from .database import init_db
+
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(init_db())
@@ -1,18 +1,42 @@
+from sqlalchemy import Index
 from sqlmodel import SQLModel, Field
 from typing import Optional
+from datetime import datetime
 import uuid
 
 
 class Order(SQLModel, table=True):
+    # (product_id, created_at) serves per-product time-range queries and,
+    # by its leading column, plain product_id lookups
+    __table_args__ = (
+        Index("ix_order_product_id_created_at", "product_id", "created_at"),
+    )
+
     id: str = Field(default_factory=lambda: str(uuid.uuid4()), primary_key=True)
-    product_id: str = Field(index=True)
+    product_id: str
     quantity: int = Field(gt=0)
     total_price: float = Field(gt=0)
+    created_at: datetime = Field(default_factory=datetime.utcnow, index=True)
 
     class Config:
         arbitrary_types_allowed = True
 
 
+class OrderRollup(SQLModel, table=True):
+    """Per-product order totals, maintained incrementally on order insert"""
+    product_id: str = Field(primary_key=True)
+    order_count: int = Field(default=0)
+    total_quantity: int = Field(default=0)
+    total_revenue: float = Field(default=0.0)
+
+
+class OrderRollupState(SQLModel, table=True):
+    """Single row recording whether OrderRollup matches the order table"""
+    id: int = Field(default=1, primary_key=True)
+    valid: bool = Field(default=False)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+
 class OrderCreate(SQLModel):
     product_id: str
     quantity: int
@@ -1,40 +1,123 @@
-import uuid
-from typing import List
+import asyncio
+import base64
+import os
+from datetime import datetime
+from typing import Dict, Tuple
 import logging
 import grpc
 
-from google.protobuf import empty_pb2
-from sqlalchemy.ext.asyncio import AsyncSession
+from google.protobuf.timestamp_pb2 import Timestamp
+from sqlalchemy import and_, or_
 from sqlmodel import select
 
-from proto_gen.order_pb2 import Order as ProtoOrder, ListOrdersResponse
+from proto_gen.order_pb2 import (
+    Order as ProtoOrder,
+    ListOrdersResponse,
+    AggregateOrdersResponse,
+    OrderAggregate,
+    PlaceOrderResult,
+    TimeBucket,
+)
 from proto_gen.order_pb2_grpc import OrderServiceServicer
 from .models import Order, OrderCreate
 from .database import get_session
 from .client import ProductServiceClient
+from .analytics import (
+    ROLLUP_ENABLED, aggregate_query, rollup_is_valid, rollup_query, track_orders
+)
 
 logger = logging.getLogger(__name__)
 
+MAX_PAGE_SIZE = 1000
+
+# PlaceOrders: unanswered requests allowed per stream before we stop reading,
+# how many requests are reserved/inserted together, and how many batches of
+# one stream may run at once (requests queue up meanwhile, so batches fill)
+PLACE_ORDERS_WINDOW = int(os.getenv("PLACE_ORDERS_WINDOW", "256"))
+PLACE_ORDERS_BATCH_SIZE = int(os.getenv("PLACE_ORDERS_BATCH_SIZE", "64"))
+PLACE_ORDERS_BATCH_LINGER = float(os.getenv("PLACE_ORDERS_BATCH_LINGER_MS", "5")) / 1000
+PLACE_ORDERS_CONCURRENT_BATCHES = int(os.getenv("PLACE_ORDERS_CONCURRENT_BATCHES", "2"))
+
+
+def _timestamp(value: datetime) -> Timestamp:
+    timestamp = Timestamp()
+    timestamp.FromDatetime(value)
+    return timestamp
+
+
+def _encode_page_token(order: Order) -> str:
+    """Keyset cursor: position after the last order of the page"""
+    cursor = f"{order.created_at.isoformat()}|{order.id}"
+    return base64.urlsafe_b64encode(cursor.encode()).decode()
+
+
+def _decode_page_token(token: str) -> Tuple[datetime, str]:
+    """Inverse of _encode_page_token; raises ValueError if malformed"""
+    try:
+        cursor = base64.urlsafe_b64decode(token.encode()).decode()
+        created_at, order_id = cursor.split("|", 1)
+        return datetime.fromisoformat(created_at), order_id
+    except Exception as e:
+        raise ValueError(f"Invalid page token: {token}") from e
+
 
 class OrderServicer(OrderServiceServicer):
     async def ListOrders(self, request, context):
-        """List all orders"""
+        """List orders by creation time, with optional filters and paging"""
+        try:
+            cursor = _decode_page_token(request.page_token) if request.page_token else None
+        except ValueError:
+            context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
+            context.set_details("Invalid page token")
+            return ListOrdersResponse()
+
         try:
+            # Filters and ordering are served by the (product_id, created_at)
+            # and created_at indexes
+            statement = select(Order)
+            if request.product_id:
+                statement = statement.where(Order.product_id == request.product_id)
+            if request.HasField("start_time"):
+                statement = statement.where(Order.created_at >= request.start_time.ToDatetime())
+            if request.HasField("end_time"):
+                statement = statement.where(Order.created_at < request.end_time.ToDatetime())
+            if cursor:
+                created_at, order_id = cursor
+                statement = statement.where(or_(
+                    Order.created_at > created_at,
+                    and_(Order.created_at == created_at, Order.id > order_id)
+                ))
+            statement = statement.order_by(Order.created_at, Order.id)
+
+            page_size = min(request.page_size, MAX_PAGE_SIZE) if request.page_size > 0 else 0
+            if page_size:
+                # One extra row tells us whether another page exists
+                statement = statement.limit(page_size + 1)
+
             async for session in get_session():
-                result = await session.execute(select(Order))
+                result = await session.execute(statement)
                 orders = result.scalars().all()
 
+                next_page_token = ""
+                if page_size and len(orders) > page_size:
+                    orders = orders[:page_size]
+                    next_page_token = _encode_page_token(orders[-1])
+
                 proto_orders = []
                 for order in orders:
                     proto_order = ProtoOrder(
                         id=order.id,
                         product_id=order.product_id,
                         quantity=order.quantity,
-                        total_price=order.total_price
+                        total_price=order.total_price,
+                        created_at=_timestamp(order.created_at)
                     )
                     proto_orders.append(proto_order)
 
-                return ListOrdersResponse(orders=proto_orders)
+                return ListOrdersResponse(
+                    orders=proto_orders,
+                    next_page_token=next_page_token
+                )
 
         except Exception as e:
             logger.error(f"Error listing orders: {e}")
@@ -60,7 +143,8 @@ class OrderServicer(OrderServiceServicer):
                     id=order.id,
                     product_id=order.product_id,
                     quantity=order.quantity,
-                    total_price=order.total_price
+                    total_price=order.total_price,
+                    created_at=_timestamp(order.created_at)
                 )
 
         except Exception as e:
@@ -70,7 +154,7 @@ class OrderServicer(OrderServiceServicer):
             return ProtoOrder()
 
     async def CreateOrder(self, request, context):
-        """Create a new order - validates product exists and calculates total price"""
+        """Create a new order - reserves product stock and calculates total price"""
         try:
             # Validate input
             if not request.product_id or request.quantity <= 0:
@@ -78,40 +162,52 @@ class OrderServicer(OrderServiceServicer):
                 context.set_details("Invalid order data")
                 return ProtoOrder()
 
-            # Validate product exists by calling product-service
+            # Reserve stock on product-service; this also validates the
+            # product exists and returns its current price
+            items = [(request.product_id, request.quantity)]
             async with ProductServiceClient() as client:
-                product = await client.get_product(request.product_id)
-
-                if not product:
-                    context.set_code(grpc.StatusCode.NOT_FOUND)
-                    context.set_details("Product not found")
-                    return ProtoOrder()
+                reservation = (await client.reserve_stock(items))[0]
 
                 # Calculate total price
-                total_price = product["price"] * request.quantity
+                total_price = reservation["price"] * request.quantity
 
                 order_data = OrderCreate(
                     product_id=request.product_id,
                     quantity=request.quantity
                 )
 
-                async for session in get_session():
-                    order = Order(
-                        **order_data.model_dump(),
-                        total_price=total_price
-                    )
-                    session.add(order)
-                    await session.commit()
-                    await session.refresh(order)
+                try:
+                    async for session in get_session():
+                        order = Order(
+                            **order_data.model_dump(),
+                            total_price=total_price
+                        )
+                        session.add(order)
+                        await track_orders(session, [order])
+                        await session.commit()
+                        await session.refresh(order)
+                except Exception:
+                    # Don't leak the reservation if the order can't be stored
+                    await client.release_stock(items)
+                    raise
 
-                    return ProtoOrder(
-                        id=order.id,
-                        product_id=order.product_id,
-                        quantity=order.quantity,
-                        total_price=order.total_price
-                    )
+                return ProtoOrder(
+                    id=order.id,
+                    product_id=order.product_id,
+                    quantity=order.quantity,
+                    total_price=order.total_price,
+                    created_at=_timestamp(order.created_at)
+                )
 
         except grpc.RpcError as e:
+            if e.code() == grpc.StatusCode.NOT_FOUND:
+                context.set_code(grpc.StatusCode.NOT_FOUND)
+                context.set_details("Product not found")
+                return ProtoOrder()
+            if e.code() == grpc.StatusCode.FAILED_PRECONDITION:
+                context.set_code(grpc.StatusCode.FAILED_PRECONDITION)
+                context.set_details("Insufficient stock")
+                return ProtoOrder()
             logger.error(f"gRPC error creating order: {e}")
             context.set_code(grpc.StatusCode.INTERNAL)
             context.set_details("Product service unavailable")
@@ -121,3 +217,273 @@ class OrderServicer(OrderServiceServicer):
             context.set_code(grpc.StatusCode.INTERNAL)
             context.set_details("Internal server error")
             return ProtoOrder()
+
+    async def AggregateOrders(self, request, context):
+        """Aggregate order counts, quantities and revenue with SQL GROUP BY"""
+        if request.time_bucket not in TimeBucket.values():
+            context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
+            context.set_details("Invalid time bucket")
+            return AggregateOrdersResponse()
+
+        if request.use_rollup:
+            return await self._aggregate_from_rollup(request, context)
+
+        try:
+            start_time = (
+                request.start_time.ToDatetime()
+                if request.HasField("start_time") else None
+            )
+            end_time = (
+                request.end_time.ToDatetime()
+                if request.HasField("end_time") else None
+            )
+            statement = aggregate_query(
+                group_by_product=request.group_by_product,
+                bucket=request.time_bucket,
+                product_ids=request.product_ids,
+                start_time=start_time,
+                end_time=end_time,
+            )
+
+            async for session in get_session():
+                result = await session.execute(statement)
+
+                aggregates = []
+                for row in result.mappings():
+                    aggregates.append(OrderAggregate(
+                        product_id=row.get("product_id") or "",
+                        bucket=row.get("bucket") or "",
+                        order_count=row["order_count"],
+                        total_quantity=row["total_quantity"],
+                        total_revenue=row["total_revenue"]
+                    ))
+
+                return AggregateOrdersResponse(aggregates=aggregates)
+
+        except Exception as e:
+            logger.error(f"Error aggregating orders: {e}")
+            context.set_code(grpc.StatusCode.INTERNAL)
+            context.set_details("Internal server error")
+            return AggregateOrdersResponse()
+
+    async def _aggregate_from_rollup(self, request, context):
+        """Serve per-product totals from the precomputed rollup table"""
+        if not ROLLUP_ENABLED:
+            context.set_code(grpc.StatusCode.FAILED_PRECONDITION)
+            context.set_details("Order rollup is disabled")
+            return AggregateOrdersResponse()
+
+        if (not request.group_by_product
+                or request.time_bucket != TimeBucket.TIME_BUCKET_NONE
+                or request.HasField("start_time")
+                or request.HasField("end_time")):
+            context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
+            context.set_details("Rollup only supports per-product totals")
+            return AggregateOrdersResponse()
+
+        try:
+            async for session in get_session():
+                if not await rollup_is_valid(session):
+                    context.set_code(grpc.StatusCode.FAILED_PRECONDITION)
+                    context.set_details("Order rollup is out of date")
+                    return AggregateOrdersResponse()
+
+                result = await session.execute(rollup_query(request.product_ids))
+                rollups = result.scalars().all()
+
+                aggregates = []
+                for rollup in rollups:
+                    aggregates.append(OrderAggregate(
+                        product_id=rollup.product_id,
+                        order_count=rollup.order_count,
+                        total_quantity=rollup.total_quantity,
+                        total_revenue=rollup.total_revenue
+                    ))
+
+                return AggregateOrdersResponse(aggregates=aggregates)
+
+        except Exception as e:
+            logger.error(f"Error reading order rollup: {e}")
+            context.set_code(grpc.StatusCode.INTERNAL)
+            context.set_details("Internal server error")
+            return AggregateOrdersResponse()
+
+    async def PlaceOrders(self, request_iterator, context):
+        """Create orders from a request stream, streaming back results"""
+        window = asyncio.Semaphore(PLACE_ORDERS_WINDOW)
+        inbound: asyncio.Queue = asyncio.Queue()
+        outbound: asyncio.Queue = asyncio.Queue()
+        cancelled = asyncio.Event()
+
+        def stopped():
+            return cancelled.is_set() or context.cancelled()
+
+        async def read_requests():
+            try:
+                async for request in request_iterator:
+                    # Blocks while the window is full: backpressure
+                    await window.acquire()
+                    await inbound.put(request)
+            finally:
+                await inbound.put(None)
+
+        async def process_batches(client):
+            batches = set()
+            batch_slots = asyncio.Semaphore(PLACE_ORDERS_CONCURRENT_BATCHES)
+            done = False
+            while not done:
+                request = await inbound.get()
+                if request is None:
+                    break
+                await batch_slots.acquire()
+                if stopped():
+                    batch_slots.release()
+                    break
+                batch = [request]
+                loop = asyncio.get_running_loop()
+                deadline = loop.time() + PLACE_ORDERS_BATCH_LINGER
+                while len(batch) < PLACE_ORDERS_BATCH_SIZE:
+                    try:
+                        request = await asyncio.wait_for(
+                            inbound.get(), max(deadline - loop.time(), 0)
+                        )
+                    except asyncio.TimeoutError:
+                        break
+                    if request is None:
+                        done = True
+                        break
+                    batch.append(request)
+                if stopped():
+                    batch_slots.release()
+                    break
+
+                task = asyncio.create_task(self._place_batch(client, batch, outbound))
+                batches.add(task)
+                task.add_done_callback(batches.discard)
+                task.add_done_callback(lambda _: batch_slots.release())
+
+            if stopped():
+                # Nobody is listening: drop queued requests, only batches
+                # already reserving/inserting run to completion
+                reader.cancel()
+                logger.info("PlaceOrders stopped early, dropping queued requests")
+            if batches:
+                await asyncio.gather(*batches)
+            await outbound.put(None)
+
+        async with ProductServiceClient() as client:
+            reader = asyncio.create_task(read_requests())
+            processor = asyncio.create_task(process_batches(client))
+            completed = False
+            try:
+                while True:
+                    result = await outbound.get()
+                    if result is None:
+                        break
+                    yield result
+                    window.release()
+                # Surface errors from reading the request stream
+                if not stopped():
+                    await reader
+                completed = True
+            finally:
+                if not completed:
+                    # The client cancelled (this handler is being cancelled)
+                    # or the stream failed; the sentinel wakes process_batches
+                    # if it's waiting for work
+                    cancelled.set()
+                    inbound.put_nowait(None)
+                reader.cancel()
+                # Let accepted batches finish so no reservation is left dangling
+                await asyncio.gather(processor, return_exceptions=True)
+
+    async def _place_batch(self, client, requests, outbound):
+        """Reserve stock and insert a batch of streamed orders"""
+        results = {}
+        valid = []
+        for request in requests:
+            if not request.product_id or request.quantity <= 0:
+                results[id(request)] = PlaceOrderResult(
+                    request_id=request.request_id,
+                    code=grpc.StatusCode.INVALID_ARGUMENT.value[0],
+                    message="Invalid order data"
+                )
+            else:
+                valid.append(request)
+
+        try:
+            prices = await self._reserve_batch(client, valid, results)
+            reserved = [request for request in valid if id(request) in prices]
+
+            if reserved:
+                orders = []
+                for request in reserved:
+                    order_data = OrderCreate(
+                        product_id=request.product_id,
+                        quantity=request.quantity
+                    )
+                    orders.append(Order(
+                        **order_data.model_dump(),
+                        total_price=prices[id(request)] * request.quantity
+                    ))
+
+                try:
+                    async for session in get_session():
+                        session.add_all(orders)
+                        await track_orders(session, orders)
+                        await session.commit()
+                except Exception:
+                    await client.release_stock(
+                        [(request.product_id, request.quantity) for request in reserved]
+                    )
+                    raise
+
+                for request, order in zip(reserved, orders):
+                    results[id(request)] = PlaceOrderResult(
+                        request_id=request.request_id,
+                        order=ProtoOrder(
+                            id=order.id,
+                            product_id=order.product_id,
+                            quantity=order.quantity,
+                            total_price=order.total_price,
+                            created_at=_timestamp(order.created_at)
+                        )
+                    )
+
+        except Exception as e:
+            logger.error(f"Error placing order batch: {e}")
+            for request in valid:
+                results.setdefault(id(request), PlaceOrderResult(
+                    request_id=request.request_id,
+                    code=grpc.StatusCode.INTERNAL.value[0],
+                    message="Internal server error"
+                ))
+
+        for request in requests:
+            await outbound.put(results[id(request)])
+
+    async def _reserve_batch(self, client, requests, results) -> Dict[int, float]:
+        """Reserve stock for a batch; returns unit prices keyed by request.
+
+        One partial ReserveStock call covers the whole batch, so an order
+        for a missing or sold-out product gets its own error result without
+        failing, or costing extra round trips for, the rest of the batch.
+        """
+        if not requests:
+            return {}
+
+        reservations = await client.reserve_stock(
+            [(request.product_id, request.quantity) for request in requests],
+            partial=True
+        )
+        prices = {}
+        for request, reservation in zip(requests, reservations):
+            if reservation["code"] == grpc.StatusCode.OK.value[0]:
+                prices[id(request)] = reservation["price"]
+            else:
+                results[id(request)] = PlaceOrderResult(
+                    request_id=request.request_id,
+                    code=reservation["code"],
+                    message=reservation["message"]
+                )
+        return prices
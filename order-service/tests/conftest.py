@@ -0,0 +1,171 @@
+"""Test setup: generated stubs and a throwaway database.
+
+Tests run against a temporary SQLite file. Set TEST_DATABASE_URL to run
+them against PostgreSQL instead, e.g.
+
+    TEST_DATABASE_URL=postgresql+asyncpg://postgres@localhost/test_orders pytest
+
+The database is wiped before every test, so never point it at real data.
+"""
+import asyncio
+import os
+import sys
+import tempfile
+from importlib import resources
+from pathlib import Path
+
+import grpc
+import pytest
+
+SERVICE_DIR = Path(__file__).resolve().parents[1]
+PROTO_DIR = SERVICE_DIR / "protos"
+PROTO_GEN_DIR = SERVICE_DIR / "proto_gen"
+
+
+def _generate_stubs():
+    # Same stubs the Dockerfile builds; regenerated so they match the protos
+    from grpc_tools import protoc
+
+    PROTO_GEN_DIR.mkdir(exist_ok=True)
+    args = [
+        "grpc_tools.protoc",
+        f"-I{PROTO_DIR}",
+        f"-I{resources.files('grpc_tools') / '_proto'}",
+        f"--python_out={PROTO_GEN_DIR}",
+        f"--grpc_python_out={PROTO_GEN_DIR}",
+        *(str(proto) for proto in sorted(PROTO_DIR.glob("*.proto"))),
+    ]
+    if protoc.main(args) != 0:
+        raise RuntimeError("Failed to generate gRPC stubs")
+
+
+# Must happen before anything imports app.database
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+os.environ["DATABASE_URL"] = (
+    TEST_DATABASE_URL
+    or f"sqlite+aiosqlite:///{tempfile.mkdtemp()}/test_orders.db"
+)
+os.environ.setdefault("DATABASE_ECHO", "false")
+
+_generate_stubs()
+sys.path[:0] = [str(SERVICE_DIR), str(PROTO_GEN_DIR)]
+
+
+class Context:
+    """Minimal stand-in for grpc.aio.ServicerContext"""
+
+    def __init__(self):
+        self.code = grpc.StatusCode.OK
+        self.details = ""
+        self.is_cancelled = False
+
+    def set_code(self, code):
+        self.code = code
+
+    def set_details(self, details):
+        self.details = details
+
+    def cancelled(self):
+        return self.is_cancelled
+
+
+def rpc_error(code, details):
+    return grpc.aio.AioRpcError(code, grpc.aio.Metadata(), grpc.aio.Metadata(), details)
+
+
+class FakeProductService:
+    """In-memory stand-in for ProductServiceClient, with ReserveStock semantics"""
+
+    def __init__(self):
+        self.products = {}
+        self.reserve_calls = []
+        self.released = []
+
+    def add_product(self, product_id, price, stock):
+        self.products[product_id] = {"price": price, "stock": stock}
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        pass
+
+    async def reserve_stock(self, items, partial=False):
+        self.reserve_calls.append(list(items))
+        if partial:
+            return [self._reserve_one(product_id, quantity) for product_id, quantity in items]
+
+        merged = {}
+        for product_id, quantity in items:
+            merged[product_id] = merged.get(product_id, 0) + quantity
+        for product_id, quantity in merged.items():
+            if product_id not in self.products:
+                raise rpc_error(grpc.StatusCode.NOT_FOUND, f"Product not found: {product_id}")
+            if self.products[product_id]["stock"] < quantity:
+                raise rpc_error(grpc.StatusCode.FAILED_PRECONDITION, f"Insufficient stock: {product_id}")
+        return [self._reserve_one(product_id, quantity) for product_id, quantity in merged.items()]
+
+    def _reserve_one(self, product_id, quantity):
+        result = {"product_id": product_id, "quantity": quantity, "price": 0.0,
+                  "remaining_stock": 0, "code": 0, "message": ""}
+        product = self.products.get(product_id)
+        if product is None:
+            result.update(code=grpc.StatusCode.NOT_FOUND.value[0], message="Product not found")
+        elif product["stock"] < quantity:
+            result.update(code=grpc.StatusCode.FAILED_PRECONDITION.value[0], message="Insufficient stock")
+        else:
+            product["stock"] -= quantity
+            result.update(price=product["price"], remaining_stock=product["stock"])
+        return result
+
+    async def release_stock(self, items):
+        self.released.append(list(items))
+        for product_id, quantity in items:
+            self.products[product_id]["stock"] += quantity
+        return True
+
+
+@pytest.fixture
+def context():
+    return Context()
+
+
+@pytest.fixture
+def product_service(monkeypatch):
+    """Fake product-service used by the order servicer"""
+    service = FakeProductService()
+    monkeypatch.setattr("app.servicer.ProductServiceClient", lambda *args, **kwargs: service)
+    return service
+
+
+@pytest.fixture
+async def empty_db():
+    """Database with every table dropped"""
+    from sqlalchemy import MetaData
+    from app.database import engine
+
+    def drop_all(conn):
+        metadata = MetaData()
+        metadata.reflect(conn)
+        metadata.drop_all(conn)
+
+    async with engine.begin() as conn:
+        await conn.run_sync(drop_all)
+    yield engine
+
+    # Servicers return from inside `async for session in get_session()`, so
+    # the event loop closes those sessions in tasks of its own; let them
+    # finish, then drop pooled connections, which belong to this test's loop
+    await asyncio.sleep(0)
+    pending = asyncio.all_tasks() - {asyncio.current_task()}
+    await asyncio.gather(*pending, return_exceptions=True)
+    await engine.dispose()
+
+
+@pytest.fixture
+async def db(empty_db):
+    """Empty database with all migrations applied"""
+    from app.database import init_db
+
+    await init_db()
+    return empty_db
@@ -0,0 +1,186 @@
+from datetime import datetime
+
+import grpc
+import pytest
+from google.protobuf.timestamp_pb2 import Timestamp
+from sqlalchemy import delete
+from sqlmodel import select
+
+from proto_gen.order_pb2 import AggregateOrdersRequest, TimeBucket
+from app import analytics
+from app.analytics import record_orders, track_orders
+from app.database import engine, get_session, init_db
+from app.models import Order, OrderRollup, OrderRollupState
+from app.servicer import OrderServicer
+from conftest import Context
+
+
+async def _add_orders(orders, rollup=False):
+    async for session in get_session():
+        session.add_all(orders)
+        if rollup:
+            await record_orders(session, orders)
+        await session.commit()
+
+
+def _timestamp(value: datetime) -> Timestamp:
+    timestamp = Timestamp()
+    timestamp.FromDatetime(value)
+    return timestamp
+
+
+async def _aggregate(context, **fields):
+    response = await OrderServicer().AggregateOrders(
+        AggregateOrdersRequest(**fields), context
+    )
+    assert context.code == grpc.StatusCode.OK, context.details
+    return [
+        (aggregate.product_id, aggregate.bucket, aggregate.order_count,
+         aggregate.total_quantity, aggregate.total_revenue)
+        for aggregate in response.aggregates
+    ]
+
+
+@pytest.mark.parametrize("bucket, expected", [
+    (TimeBucket.TIME_BUCKET_HOUR, [
+        ("2024-05-01T13:00:00", 2), ("2024-05-01T14:00:00", 1), ("2024-06-02T00:00:00", 1)
+    ]),
+    (TimeBucket.TIME_BUCKET_DAY, [("2024-05-01", 3), ("2024-06-02", 1)]),
+    (TimeBucket.TIME_BUCKET_MONTH, [("2024-05", 3), ("2024-06", 1)]),
+])
+async def test_time_bucket_labels_match_across_dialects(db, context, bucket, expected):
+    await _add_orders([
+        Order(product_id="p1", quantity=1, total_price=2.0,
+              created_at=datetime(2024, 5, 1, 13, 0, 0)),
+        Order(product_id="p1", quantity=2, total_price=4.0,
+              created_at=datetime(2024, 5, 1, 13, 59, 59, 999999)),
+        Order(product_id="p1", quantity=1, total_price=2.0,
+              created_at=datetime(2024, 5, 1, 14, 0, 0)),
+        Order(product_id="p1", quantity=3, total_price=6.0,
+              created_at=datetime(2024, 6, 2, 0, 0, 1)),
+    ])
+
+    aggregates = await _aggregate(context, time_bucket=bucket)
+
+    assert [(label, count) for _, label, count, _, _ in aggregates] == expected
+
+
+async def test_group_by_product_with_time_range(db, context):
+    await _add_orders([
+        Order(product_id="p1", quantity=1, total_price=2.5,
+              created_at=datetime(2024, 5, 1)),
+        Order(product_id="p1", quantity=2, total_price=5.0,
+              created_at=datetime(2024, 5, 2)),
+        Order(product_id="p2", quantity=4, total_price=4.0,
+              created_at=datetime(2024, 5, 3)),
+        Order(product_id="p2", quantity=1, total_price=1.0,
+              created_at=datetime(2024, 6, 1)),
+    ])
+
+    aggregates = await _aggregate(
+        context,
+        group_by_product=True,
+        start_time=_timestamp(datetime(2024, 5, 1)),
+        end_time=_timestamp(datetime(2024, 6, 1)),
+    )
+
+    assert aggregates == [("p1", "", 2, 3, 7.5), ("p2", "", 1, 4, 4.0)]
+
+
+async def test_record_orders_upserts_rollup(db):
+    await _add_orders([
+        Order(product_id="p1", quantity=1, total_price=2.0),
+        Order(product_id="p1", quantity=2, total_price=4.0),
+        Order(product_id="p2", quantity=5, total_price=1.0),
+    ], rollup=True)
+    # Second insert for existing products takes the ON CONFLICT path
+    await _add_orders([
+        Order(product_id="p1", quantity=3, total_price=6.0),
+    ], rollup=True)
+
+    async for session in get_session():
+        result = await session.execute(select(OrderRollup).order_by(OrderRollup.product_id))
+        rollups = [
+            (rollup.product_id, rollup.order_count, rollup.total_quantity, rollup.total_revenue)
+            for rollup in result.scalars()
+        ]
+
+    assert rollups == [("p1", 3, 6, 12.0), ("p2", 1, 5, 1.0)]
+
+
+async def _rollup_totals():
+    context = Context()
+    response = await OrderServicer().AggregateOrders(
+        AggregateOrdersRequest(group_by_product=True, use_rollup=True), context
+    )
+    totals = [
+        (aggregate.product_id, aggregate.order_count, aggregate.total_quantity)
+        for aggregate in response.aggregates
+    ]
+    return context.code, totals
+
+
+async def test_rollup_is_rejected_then_rebuilt_after_running_without_it(db, monkeypatch):
+    await _add_orders([Order(product_id="p1", quantity=1, total_price=2.0)], rollup=True)
+
+    # A replica with the rollup disabled starts and takes orders
+    monkeypatch.setattr(analytics, "ROLLUP_ENABLED", False)
+    await init_db()
+    await _add_orders([
+        Order(product_id="p1", quantity=2, total_price=4.0),
+        Order(product_id="p2", quantity=3, total_price=3.0),
+    ])
+
+    assert await _rollup_totals() == (grpc.StatusCode.FAILED_PRECONDITION, [])
+
+    # Next start with the rollup enabled rebuilds it from the orders
+    monkeypatch.setattr(analytics, "ROLLUP_ENABLED", True)
+    await init_db()
+
+    assert await _rollup_totals() == (grpc.StatusCode.OK, [("p1", 2, 3), ("p2", 1, 3)])
+
+
+async def _place_orders(orders):
+    """Insert orders the way the servicer does, honouring ROLLUP_ENABLED"""
+    async for session in get_session():
+        session.add_all(orders)
+        await track_orders(session, orders)
+        await session.commit()
+
+
+async def test_orders_from_disabled_replica_invalidate_rebuilt_rollup(db, monkeypatch):
+    # Replica A starts with the rollup disabled
+    monkeypatch.setattr(analytics, "ROLLUP_ENABLED", False)
+    await init_db()
+    # Replica B restarts with it enabled and rebuilds it
+    monkeypatch.setattr(analytics, "ROLLUP_ENABLED", True)
+    await init_db()
+    await _place_orders([Order(product_id="p1", quantity=1, total_price=2.0)])
+    assert await _rollup_totals() == (grpc.StatusCode.OK, [("p1", 1, 1)])
+
+    # Replica A keeps taking orders
+    monkeypatch.setattr(analytics, "ROLLUP_ENABLED", False)
+    await _place_orders([Order(product_id="p1", quantity=2, total_price=4.0)])
+    await _place_orders([Order(product_id="p2", quantity=3, total_price=3.0)])
+
+    assert await _rollup_totals() == (grpc.StatusCode.FAILED_PRECONDITION, [])
+
+    monkeypatch.setattr(analytics, "ROLLUP_ENABLED", True)
+    await init_db()
+
+    assert await _rollup_totals() == (grpc.StatusCode.OK, [("p1", 2, 3), ("p2", 1, 3)])
+
+
+async def test_rollup_without_state_is_rebuilt_at_startup(db):
+    # Rollup written before its state was tracked, missing some orders
+    await _add_orders([
+        Order(product_id="p1", quantity=1, total_price=2.0),
+        Order(product_id="p1", quantity=4, total_price=8.0),
+    ])
+    await _add_orders([Order(product_id="p1", quantity=1, total_price=2.0)], rollup=True)
+    async with engine.begin() as conn:
+        await conn.execute(delete(OrderRollupState))
+
+    await init_db()
+
+    assert await _rollup_totals() == (grpc.StatusCode.OK, [("p1", 3, 6)])
@@ -0,0 +1,121 @@
+import uuid
+from datetime import datetime, timedelta
+
+import grpc
+from google.protobuf.timestamp_pb2 import Timestamp
+from sqlalchemy import inspect, text
+
+from proto_gen.order_pb2 import ListOrdersRequest
+from app.database import engine, get_session, init_db
+from app.models import Order
+from app.servicer import OrderServicer
+from conftest import Context
+
+
+def _timestamp(value: datetime) -> Timestamp:
+    timestamp = Timestamp()
+    timestamp.FromDatetime(value)
+    return timestamp
+
+
+async def _create_baseline_orders(count):
+    """Order table as it was before migrations, with `count` orders"""
+    order_ids = [str(uuid.uuid4()) for _ in range(count)]
+    async with engine.begin() as conn:
+        await conn.execute(text(
+            'CREATE TABLE "order" (id VARCHAR NOT NULL PRIMARY KEY, '
+            'product_id VARCHAR NOT NULL, quantity INTEGER NOT NULL, '
+            'total_price FLOAT NOT NULL)'
+        ))
+        await conn.execute(text('CREATE INDEX ix_order_product_id ON "order" (product_id)'))
+        for order_id in order_ids:
+            await conn.execute(
+                text('INSERT INTO "order" (id, product_id, quantity, total_price) '
+                     'VALUES (:id, :product_id, 1, 2.0)'),
+                {"id": order_id, "product_id": "p1"}
+            )
+    return order_ids
+
+
+async def _page_through(page_size, **fields):
+    """Follow next_page_token to the end; returns the order ids per page"""
+    servicer = OrderServicer()
+    pages = []
+    token = ""
+    while True:
+        context = Context()
+        response = await servicer.ListOrders(
+            ListOrdersRequest(page_size=page_size, page_token=token, **fields), context
+        )
+        assert context.code == grpc.StatusCode.OK, context.details
+        pages.append([order.id for order in response.orders])
+        token = response.next_page_token
+        if not token:
+            return pages
+
+
+async def test_upgrade_from_baseline_pages_every_order_once(empty_db):
+    order_ids = await _create_baseline_orders(5)
+
+    await init_db()
+    pages = await _page_through(page_size=2)
+
+    assert [len(page) for page in pages] == [2, 2, 1]
+    # Backfilled rows are ordered by id
+    assert [order_id for page in pages for order_id in page] == sorted(order_ids)
+
+
+async def test_upgrade_replaces_product_index_with_composite_index(empty_db):
+    await _create_baseline_orders(1)
+
+    await init_db()
+
+    async with engine.connect() as conn:
+        indexes = await conn.run_sync(
+            lambda sync_conn: {index["name"] for index in inspect(sync_conn).get_indexes("order")}
+        )
+    assert "ix_order_product_id" not in indexes
+    assert {"ix_order_created_at", "ix_order_product_id_created_at"} <= indexes
+
+
+async def test_orders_placed_after_upgrade_page_after_migrated_ones(empty_db):
+    order_ids = await _create_baseline_orders(3)
+    await init_db()
+
+    async for session in get_session():
+        new_order = Order(product_id="p1", quantity=1, total_price=2.0)
+        session.add(new_order)
+        await session.commit()
+
+    pages = await _page_through(page_size=2)
+
+    assert [order_id for page in pages for order_id in page] == sorted(order_ids) + [new_order.id]
+
+
+async def test_list_orders_filters_by_product_and_time(db):
+    start = datetime(2024, 5, 1)
+    async for session in get_session():
+        orders = [
+            Order(product_id="p1", quantity=1, total_price=1.0, created_at=start - timedelta(days=1)),
+            Order(product_id="p1", quantity=1, total_price=1.0, created_at=start),
+            Order(product_id="p2", quantity=1, total_price=1.0, created_at=start + timedelta(hours=1)),
+            Order(product_id="p1", quantity=1, total_price=1.0, created_at=start + timedelta(days=1)),
+            Order(product_id="p1", quantity=1, total_price=1.0, created_at=start + timedelta(days=2)),
+        ]
+        session.add_all(orders)
+        await session.commit()
+
+    pages = await _page_through(
+        page_size=1,
+        product_id="p1",
+        start_time=_timestamp(start),
+        end_time=_timestamp(start + timedelta(days=2)),
+    )
+
+    assert pages == [[orders[1].id], [orders[3].id]]
+
+
+async def test_list_orders_rejects_malformed_page_token(db, context):
+    await OrderServicer().ListOrders(ListOrdersRequest(page_token="not a token"), context)
+
+    assert context.code == grpc.StatusCode.INVALID_ARGUMENT
@@ -0,0 +1,86 @@
+import grpc
+from sqlmodel import select
+
+from proto_gen.order_pb2 import CreateOrderRequest
+from app import servicer as servicer_module
+from app.database import get_session
+from app.models import Order, OrderRollup
+from app.servicer import OrderServicer
+
+
+async def _stored_orders():
+    async for session in get_session():
+        result = await session.execute(select(Order))
+        return result.scalars().all()
+
+
+async def test_create_order_reserves_stock_and_prices_order(db, context, product_service):
+    product_service.add_product("p1", price=2.5, stock=10)
+
+    order = await OrderServicer().CreateOrder(
+        CreateOrderRequest(product_id="p1", quantity=4), context
+    )
+
+    assert context.code == grpc.StatusCode.OK
+    assert (order.product_id, order.quantity, order.total_price) == ("p1", 4, 10.0)
+    assert order.created_at.seconds > 0
+    assert product_service.products["p1"]["stock"] == 6
+    assert [stored.id for stored in await _stored_orders()] == [order.id]
+
+
+async def test_create_order_for_unknown_product_is_not_found(db, context, product_service):
+    await OrderServicer().CreateOrder(
+        CreateOrderRequest(product_id="missing", quantity=1), context
+    )
+
+    assert context.code == grpc.StatusCode.NOT_FOUND
+    assert await _stored_orders() == []
+
+
+async def test_create_order_without_enough_stock_fails_precondition(db, context, product_service):
+    product_service.add_product("p1", price=2.5, stock=1)
+
+    await OrderServicer().CreateOrder(
+        CreateOrderRequest(product_id="p1", quantity=2), context
+    )
+
+    assert context.code == grpc.StatusCode.FAILED_PRECONDITION
+    assert product_service.products["p1"]["stock"] == 1
+    assert await _stored_orders() == []
+
+
+async def test_create_order_releases_stock_when_insert_fails(
+    db, context, product_service, monkeypatch
+):
+    product_service.add_product("p1", price=2.5, stock=10)
+
+    async def failing_session():
+        async for session in get_session():
+            async def commit():
+                raise RuntimeError("disk full")
+            session.commit = commit
+            yield session
+
+    monkeypatch.setattr(servicer_module, "get_session", failing_session)
+
+    await OrderServicer().CreateOrder(
+        CreateOrderRequest(product_id="p1", quantity=3), context
+    )
+
+    assert context.code == grpc.StatusCode.INTERNAL
+    assert product_service.released == [[("p1", 3)]]
+    assert product_service.products["p1"]["stock"] == 10
+    assert await _stored_orders() == []
+
+
+async def test_create_order_updates_rollup(db, context, product_service):
+    product_service.add_product("p1", price=2.0, stock=10)
+
+    for quantity in (1, 3):
+        await OrderServicer().CreateOrder(
+            CreateOrderRequest(product_id="p1", quantity=quantity), context
+        )
+
+    async for session in get_session():
+        rollup = await session.get(OrderRollup, "p1")
+    assert (rollup.order_count, rollup.total_quantity, rollup.total_revenue) == (2, 4, 8.0)
@@ -0,0 +1,119 @@
+import asyncio
+
+import grpc
+import pytest
+from sqlmodel import select
+
+from proto_gen.order_pb2 import PlaceOrderRequest
+from app import servicer as servicer_module
+from app.database import get_session
+from app.models import Order
+from app.servicer import OrderServicer
+
+OK = grpc.StatusCode.OK.value[0]
+
+
+async def _stored_orders():
+    async for session in get_session():
+        result = await session.execute(select(Order))
+        return result.scalars().all()
+
+
+async def _requests(orders):
+    for request_id, (product_id, quantity) in enumerate(orders):
+        yield PlaceOrderRequest(
+            request_id=str(request_id), product_id=product_id, quantity=quantity
+        )
+
+
+def _slow_reservations(monkeypatch, product_service, delay=0.01):
+    reserve_stock = product_service.reserve_stock
+
+    async def slow_reserve_stock(items, partial=False):
+        await asyncio.sleep(delay)
+        return await reserve_stock(items, partial)
+
+    monkeypatch.setattr(product_service, "reserve_stock", slow_reserve_stock)
+
+
+async def test_place_orders_reports_each_order(db, context, product_service):
+    product_service.add_product("plenty", price=2.0, stock=1000)
+    product_service.add_product("scarce", price=3.0, stock=5)
+    orders = [
+        [("plenty", 1), ("scarce", 1), ("missing", 1), ("plenty", 0)][i % 4]
+        for i in range(200)
+    ]
+
+    results = {}
+    async for result in OrderServicer().PlaceOrders(_requests(orders), context):
+        assert result.request_id not in results
+        results[result.request_id] = result
+
+    assert len(results) == len(orders)
+    codes = {}
+    for request_id, result in results.items():
+        product_id, quantity = orders[int(request_id)]
+        codes.setdefault((product_id, quantity), []).append(result.code)
+        if result.code == OK:
+            assert result.order.total_price == quantity * {"plenty": 2.0, "scarce": 3.0}[product_id]
+    assert codes[("plenty", 1)] == [OK] * 50
+    assert sorted(codes[("scarce", 1)]) == [OK] * 5 + [grpc.StatusCode.FAILED_PRECONDITION.value[0]] * 45
+    assert codes[("missing", 1)] == [grpc.StatusCode.NOT_FOUND.value[0]] * 50
+    assert codes[("plenty", 0)] == [grpc.StatusCode.INVALID_ARGUMENT.value[0]] * 50
+
+    stored = await _stored_orders()
+    assert sorted(order.id for order in stored) == sorted(
+        result.order.id for result in results.values() if result.code == OK
+    )
+    assert product_service.products["scarce"]["stock"] == 0
+    # One reservation call per batch: failures don't trigger per-order retries
+    assert sum(len(call) for call in product_service.reserve_calls) == 150
+
+
+async def test_place_orders_stops_when_client_cancels(
+    db, context, product_service, monkeypatch
+):
+    # The whole stream is already queued, as when the client has half-closed
+    monkeypatch.setattr(servicer_module, "PLACE_ORDERS_WINDOW", 5000)
+    _slow_reservations(monkeypatch, product_service)
+    product_service.add_product("p1", price=1.0, stock=5000)
+    seen = []
+    enough = asyncio.Event()
+
+    async def client():
+        async for result in OrderServicer().PlaceOrders(_requests([("p1", 1)] * 2000), context):
+            seen.append(result)
+            if len(seen) == 10:
+                enough.set()
+
+    call = asyncio.create_task(client())
+    await enough.wait()
+    # gRPC cancels the handler when the client goes away
+    call.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await call
+
+    stored = await _stored_orders()
+    assert len(stored) < 1000
+    # Batches already started finish; no reservation is left without an order
+    assert 5000 - product_service.products["p1"]["stock"] == len(stored)
+
+
+async def test_place_orders_stops_when_context_is_cancelled(
+    db, context, product_service, monkeypatch
+):
+    monkeypatch.setattr(servicer_module, "PLACE_ORDERS_WINDOW", 5000)
+    _slow_reservations(monkeypatch, product_service)
+    product_service.add_product("p1", price=1.0, stock=5000)
+
+    seen = []
+    async for result in OrderServicer().PlaceOrders(_requests([("p1", 1)] * 2000), context):
+        seen.append(result)
+        if len(seen) == 10:
+            context.is_cancelled = True
+
+    stored = await _stored_orders()
+    assert len(seen) < 1000
+    # Every order placed was reported before the stream ended
+    assert sorted(order.id for order in stored) == sorted(result.order.id for result in seen)
+    assert 5000 - product_service.products["p1"]["stock"] == len(stored)
@@ -0,0 +1,3 @@
+-- Each service owns its own database
+CREATE DATABASE products;
+CREATE DATABASE orders;
@@ -0,0 +1,105 @@
+"""Versioned schema migrations, applied in order at startup.
+
+Each migration runs once and is recorded in the schema_migrations table.
+Migrations must be idempotent: databases created before versioning was
+introduced have no schema_migrations table and replay every step.
+
+Run standalone with: python -m app.migrations
+"""
+import asyncio
+import logging
+import os
+from datetime import datetime
+from typing import Callable, List, Tuple
+
+from sqlalchemy import (
+    Column, DateTime, Integer, MetaData, String, Table, inspect, select, text
+)
+from sqlalchemy.engine import Connection
+from sqlmodel import SQLModel
+
+logger = logging.getLogger(__name__)
+
+# Arbitrary key for the PostgreSQL advisory lock that serializes replicas
+_MIGRATION_LOCK_ID = 50051
+
+# Stock given to products that existed before stock was tracked
+LEGACY_PRODUCT_STOCK = int(os.getenv("LEGACY_PRODUCT_STOCK", "0"))
+
+_migration_metadata = MetaData()
+
+schema_migrations = Table(
+    "schema_migrations",
+    _migration_metadata,
+    Column("version", Integer, primary_key=True),
+    Column("description", String, nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+
+def _has_column(conn: Connection, table: str, column: str) -> bool:
+    return column in {c["name"] for c in inspect(conn).get_columns(table)}
+
+
+def _create_tables(conn: Connection):
+    # Register all models before creating their tables
+    from .models import Product
+    SQLModel.metadata.create_all(conn)
+
+
+def _add_product_stock(conn: Connection):
+    # Legacy products have unknown inventory, so by default they start out
+    # of stock (overselling is worse than a 409) until restocked through
+    # RestockProduct; LEGACY_PRODUCT_STOCK opts into a different level
+    if not _has_column(conn, "product", "stock"):
+        conn.execute(text(
+            "ALTER TABLE product ADD COLUMN stock INTEGER NOT NULL DEFAULT 0"
+        ))
+        if LEGACY_PRODUCT_STOCK:
+            conn.execute(
+                text("UPDATE product SET stock = :stock"),
+                {"stock": LEGACY_PRODUCT_STOCK}
+            )
+        legacy = conn.execute(text("SELECT count(*) FROM product")).scalar_one()
+        if legacy:
+            logger.warning(
+                f"{legacy} existing products start with stock={LEGACY_PRODUCT_STOCK}; "
+                f"restock them via RestockProduct"
+            )
+
+
+MIGRATIONS: List[Tuple[int, str, Callable[[Connection], None]]] = [
+    (1, "create tables", _create_tables),
+    (2, "add product.stock", _add_product_stock),
+]
+
+
+def _apply_migrations(conn: Connection):
+    if conn.dialect.name == "postgresql":
+        conn.execute(text(f"SELECT pg_advisory_xact_lock({_MIGRATION_LOCK_ID})"))
+
+    _migration_metadata.create_all(conn)
+    applied = set(conn.execute(select(schema_migrations.c.version)).scalars())
+
+    for version, description, migrate in MIGRATIONS:
+        if version in applied:
+            continue
+        logger.info(f"Applying migration {version}: {description}")
+        migrate(conn)
+        conn.execute(schema_migrations.insert().values(
+            version=version,
+            description=description,
+            applied_at=datetime.utcnow(),
+        ))
+
+
+async def run_migrations(conn):
+    """Apply pending migrations on an async connection, in one transaction"""
+    await conn.run_sync(_apply_migrations)
+
+
+if __name__ == '__main__':
+    from .database import init_db
+
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(init_db())
@@ -8,6 +8,7 @@ class Product(SQLModel, table=True):
     name: str = Field(index=True)
     description: str
     price: float = Field(gt=0)
+    stock: int = Field(default=0, ge=0)
 
     class Config:
         arbitrary_types_allowed = True
@@ -17,9 +18,11 @@ class ProductCreate(SQLModel):
     name: str
     description: str
     price: float
+    stock: int = 0
 
 
 class ProductUpdate(SQLModel):
     name: Optional[str] = None
     description: Optional[str] = None
     price: Optional[float] = None
+    stock: Optional[int] = None
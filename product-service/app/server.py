@@ -1,19 +1,34 @@
+import argparse
 import asyncio
 import logging
-import grpc
-from concurrent import futures
-
-from proto_gen.product_pb2_grpc import add_ProductServiceServicer_to_server
-from .servicer import ProductServicer
-from .database import init_db
+import os
+import sys
+import time
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+_STARTED = time.perf_counter()
+
+# TCP listen address, plus an optional unix socket path for co-located callers
+LISTEN_ADDRESS = os.getenv("GRPC_LISTEN_ADDRESS", "[::]:50051")
+UNIX_SOCKET_PATH = os.getenv("GRPC_UNIX_SOCKET")
+
+# Cold-start budget (interpreter start to serving) checked by --profile-startup
+STARTUP_TARGET_SECONDS = float(os.getenv("STARTUP_TARGET_SECONDS", "1.0"))
+
 
-async def serve():
+async def serve(exit_when_ready: bool = False):
     """Start the gRPC server"""
+    # Imported here so --profile-startup and --help don't pay for them
+    import grpc
+    from concurrent import futures
+
+    from proto_gen.product_pb2_grpc import add_ProductServiceServicer_to_server
+    from .servicer import ProductServicer
+    from .database import engine, init_db
+
     # Initialize database
     await init_db()
     logger.info("Database initialized")
@@ -25,12 +40,26 @@ async def serve():
     add_ProductServiceServicer_to_server(ProductServicer(), server)
 
     # Add insecure port
-    server.add_insecure_port('[::]:50051')
-    logger.info("Product service listening on port 50051")
+    server.add_insecure_port(LISTEN_ADDRESS)
+    logger.info(f"Product service listening on {LISTEN_ADDRESS}")
+
+    # Same-host clients can skip the TCP stack via a unix domain socket
+    if UNIX_SOCKET_PATH:
+        if os.path.exists(UNIX_SOCKET_PATH):
+            os.unlink(UNIX_SOCKET_PATH)
+        server.add_insecure_port(f"unix:{UNIX_SOCKET_PATH}")
+        logger.info(f"Product service listening on unix:{UNIX_SOCKET_PATH}")
 
     # Start server
     await server.start()
-    logger.info("Product service started")
+    logger.info(f"Product service started in {time.perf_counter() - _STARTED:.3f}s")
+
+    if exit_when_ready:
+        from .startup import report_ready
+        report_ready()
+        await server.stop(0)
+        await engine.dispose()
+        return
 
     # Wait for termination
     try:
@@ -40,5 +69,38 @@ async def serve():
         await server.stop(0)
 
 
+def main():
+    parser = argparse.ArgumentParser(description="Product gRPC service")
+    parser.add_argument(
+        "--profile-startup",
+        action="store_true",
+        help="measure a cold start and print the import-time breakdown per module"
+    )
+    parser.add_argument("--exit-when-ready", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.profile_startup:
+        import tempfile
+        from .startup import profile_startup
+
+        # Profile on a throwaway port and database; the live unix socket and
+        # database must not be touched (startup unlinks one, migrates the other)
+        with tempfile.TemporaryDirectory() as tmp:
+            env = dict(
+                os.environ,
+                GRPC_LISTEN_ADDRESS="127.0.0.1:0",
+                DATABASE_URL=f"sqlite+aiosqlite:///{tmp}/profile.db",
+            )
+            env.pop("GRPC_UNIX_SOCKET", None)
+            code = profile_startup(
+                ["-m", "app.server", "--exit-when-ready"],
+                STARTUP_TARGET_SECONDS,
+                env=env,
+            )
+        sys.exit(code)
+
+    asyncio.run(serve(exit_when_ready=args.exit_when_ready))
+
+
 if __name__ == '__main__':
-    asyncio.run(serve())
+    main()
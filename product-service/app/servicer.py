@@ -1,13 +1,16 @@
-import uuid
-from typing import List
+from typing import Dict, Optional
 import logging
 import grpc
 
-from google.protobuf import empty_pb2
-from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import update
 from sqlmodel import select
 
-from proto_gen.product_pb2 import Product as ProtoProduct, ListProductsResponse
+from proto_gen.product_pb2 import (
+    Product as ProtoProduct,
+    ListProductsResponse,
+    StockReservation,
+    StockResponse,
+)
 from proto_gen.product_pb2_grpc import ProductServiceServicer
 from .models import Product, ProductCreate
 from .database import get_session
@@ -15,6 +18,16 @@ from .database import get_session
 logger = logging.getLogger(__name__)
 
 
+def _merge_stock_items(items) -> Optional[Dict[str, int]]:
+    """Sum quantities per product; None if any item is invalid"""
+    merged: Dict[str, int] = {}
+    for item in items:
+        if not item.product_id or item.quantity <= 0:
+            return None
+        merged[item.product_id] = merged.get(item.product_id, 0) + item.quantity
+    return merged or None
+
+
 class ProductServicer(ProductServiceServicer):
     async def ListProducts(self, request, context):
         """List all products"""
@@ -29,7 +42,8 @@ class ProductServicer(ProductServiceServicer):
                         id=product.id,
                         name=product.name,
                         description=product.description,
-                        price=product.price
+                        price=product.price,
+                        stock=product.stock
                     )
                     proto_products.append(proto_product)
 
@@ -59,7 +73,8 @@ class ProductServicer(ProductServiceServicer):
                     id=product.id,
                     name=product.name,
                     description=product.description,
-                    price=product.price
+                    price=product.price,
+                    stock=product.stock
                 )
 
         except Exception as e:
@@ -72,7 +87,8 @@ class ProductServicer(ProductServiceServicer):
         """Create a new product"""
         try:
             # Validate input
-            if not request.name or not request.description or request.price <= 0:
+            if (not request.name or not request.description
+                    or request.price <= 0 or request.stock < 0):
                 context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
                 context.set_details("Invalid product data")
                 return ProtoProduct()
@@ -80,7 +96,8 @@ class ProductServicer(ProductServiceServicer):
             product_data = ProductCreate(
                 name=request.name,
                 description=request.description,
-                price=request.price
+                price=request.price,
+                stock=request.stock
             )
 
             async for session in get_session():
@@ -93,7 +110,8 @@ class ProductServicer(ProductServiceServicer):
                     id=product.id,
                     name=product.name,
                     description=product.description,
-                    price=product.price
+                    price=product.price,
+                    stock=product.stock
                 )
 
         except Exception as e:
@@ -101,3 +119,211 @@ class ProductServicer(ProductServiceServicer):
             context.set_code(grpc.StatusCode.INTERNAL)
             context.set_details("Internal server error")
             return ProtoProduct()
+
+    async def ReserveStock(self, request, context):
+        """Atomically reserve stock for all requested items, or none of them"""
+        if request.partial:
+            return await self._reserve_each(request, context)
+
+        items = _merge_stock_items(request.items)
+        if items is None:
+            context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
+            context.set_details("Invalid stock items")
+            return StockResponse()
+
+        try:
+            async for session in get_session():
+                reservations = []
+                # Fixed product order keeps concurrent batches from deadlocking
+                for product_id in sorted(items):
+                    quantity = items[product_id]
+                    # Conditional decrement: no read-modify-write, the row is
+                    # only touched when enough stock is left
+                    result = await session.execute(
+                        update(Product)
+                        .where(Product.id == product_id, Product.stock >= quantity)
+                        .values(stock=Product.stock - quantity)
+                        .returning(Product.price, Product.stock)
+                        .execution_options(synchronize_session=False)
+                    )
+                    row = result.first()
+
+                    if row is None:
+                        await session.rollback()
+                        exists = await session.execute(
+                            select(Product.id).where(Product.id == product_id)
+                        )
+                        if exists.first() is None:
+                            context.set_code(grpc.StatusCode.NOT_FOUND)
+                            context.set_details(f"Product not found: {product_id}")
+                        else:
+                            context.set_code(grpc.StatusCode.FAILED_PRECONDITION)
+                            context.set_details(f"Insufficient stock: {product_id}")
+                        return StockResponse()
+
+                    reservations.append(StockReservation(
+                        product_id=product_id,
+                        quantity=quantity,
+                        price=row.price,
+                        remaining_stock=row.stock
+                    ))
+
+                await session.commit()
+                return StockResponse(items=reservations)
+
+        except Exception as e:
+            logger.error(f"Error reserving stock: {e}")
+            context.set_code(grpc.StatusCode.INTERNAL)
+            context.set_details("Internal server error")
+            return StockResponse()
+
+    async def _reserve_each(self, request, context):
+        """Reserve each item on its own, reporting a status per item"""
+        if not request.items:
+            context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
+            context.set_details("Invalid stock items")
+            return StockResponse()
+
+        try:
+            async for session in get_session():
+                results = [None] * len(request.items)
+                missing = set()
+                # Fixed product order keeps concurrent batches from
+                # deadlocking; items of one product keep request order
+                for index in sorted(
+                    range(len(request.items)),
+                    key=lambda i: request.items[i].product_id
+                ):
+                    item = request.items[index]
+                    if not item.product_id or item.quantity <= 0:
+                        code, message = grpc.StatusCode.INVALID_ARGUMENT, "Invalid stock item"
+                    elif item.product_id in missing:
+                        code, message = grpc.StatusCode.NOT_FOUND, "Product not found"
+                    else:
+                        # Same conditional decrement as the all-or-nothing path;
+                        # a miss leaves the row untouched, so no rollback needed
+                        result = await session.execute(
+                            update(Product)
+                            .where(Product.id == item.product_id, Product.stock >= item.quantity)
+                            .values(stock=Product.stock - item.quantity)
+                            .returning(Product.price, Product.stock)
+                            .execution_options(synchronize_session=False)
+                        )
+                        row = result.first()
+                        if row is not None:
+                            results[index] = StockReservation(
+                                product_id=item.product_id,
+                                quantity=item.quantity,
+                                price=row.price,
+                                remaining_stock=row.stock
+                            )
+                            continue
+
+                        exists = await session.execute(
+                            select(Product.id).where(Product.id == item.product_id)
+                        )
+                        if exists.first() is None:
+                            missing.add(item.product_id)
+                            code, message = grpc.StatusCode.NOT_FOUND, "Product not found"
+                        else:
+                            code, message = grpc.StatusCode.FAILED_PRECONDITION, "Insufficient stock"
+
+                    results[index] = StockReservation(
+                        product_id=item.product_id,
+                        quantity=item.quantity,
+                        code=code.value[0],
+                        message=message
+                    )
+
+                await session.commit()
+                return StockResponse(items=results)
+
+        except Exception as e:
+            logger.error(f"Error reserving stock: {e}")
+            context.set_code(grpc.StatusCode.INTERNAL)
+            context.set_details("Internal server error")
+            return StockResponse()
+
+    async def ReleaseStock(self, request, context):
+        """Return previously reserved stock to the products"""
+        items = _merge_stock_items(request.items)
+        if items is None:
+            context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
+            context.set_details("Invalid stock items")
+            return StockResponse()
+
+        try:
+            async for session in get_session():
+                releases = []
+                for product_id in sorted(items):
+                    quantity = items[product_id]
+                    result = await session.execute(
+                        update(Product)
+                        .where(Product.id == product_id)
+                        .values(stock=Product.stock + quantity)
+                        .returning(Product.price, Product.stock)
+                        .execution_options(synchronize_session=False)
+                    )
+                    row = result.first()
+
+                    if row is None:
+                        await session.rollback()
+                        context.set_code(grpc.StatusCode.NOT_FOUND)
+                        context.set_details(f"Product not found: {product_id}")
+                        return StockResponse()
+
+                    releases.append(StockReservation(
+                        product_id=product_id,
+                        quantity=quantity,
+                        price=row.price,
+                        remaining_stock=row.stock
+                    ))
+
+                await session.commit()
+                return StockResponse(items=releases)
+
+        except Exception as e:
+            logger.error(f"Error releasing stock: {e}")
+            context.set_code(grpc.StatusCode.INTERNAL)
+            context.set_details("Internal server error")
+            return StockResponse()
+
+    async def RestockProduct(self, request, context):
+        """Add units to a product's stock"""
+        if not request.id or request.quantity <= 0:
+            context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
+            context.set_details("Invalid restock quantity")
+            return ProtoProduct()
+
+        try:
+            async for session in get_session():
+                # Increment in SQL so concurrent reservations aren't overwritten
+                result = await session.execute(
+                    update(Product)
+                    .where(Product.id == request.id)
+                    .values(stock=Product.stock + request.quantity)
+                    .returning(Product.name, Product.description, Product.price, Product.stock)
+                    .execution_options(synchronize_session=False)
+                )
+                row = result.first()
+
+                if row is None:
+                    await session.rollback()
+                    context.set_code(grpc.StatusCode.NOT_FOUND)
+                    context.set_details("Product not found")
+                    return ProtoProduct()
+
+                await session.commit()
+                return ProtoProduct(
+                    id=request.id,
+                    name=row.name,
+                    description=row.description,
+                    price=row.price,
+                    stock=row.stock
+                )
+
+        except Exception as e:
+            logger.error(f"Error restocking product {request.id}: {e}")
+            context.set_code(grpc.StatusCode.INTERNAL)
+            context.set_details("Internal server error")
+            return ProtoProduct()
@@ -0,0 +1,82 @@
+"""Cold-start profiling.
+
+Runs the service in a child interpreter under ``python -X importtime``,
+waits for it to report readiness and prints an import-time breakdown per
+module along with the measured time to ready against a target.
+"""
+import os
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+READY_MARKER = "STARTUP_READY"
+
+
+def report_ready():
+    """Called by the profiled child once it is able to serve requests"""
+    print(f"{READY_MARKER} {time.time()}", flush=True)
+
+
+def _module_group(name: str) -> str:
+    # Our own modules are listed individually, third-party ones per package
+    if name.startswith("app.") or name.endswith("_pb2") or name.endswith("_pb2_grpc"):
+        return name
+    return name.split(".")[0]
+
+
+def import_breakdown(importtime_output: str) -> Dict[str, int]:
+    """Sum `-X importtime` self times (microseconds) per module group"""
+    totals: Dict[str, int] = defaultdict(int)
+    for line in importtime_output.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        # "import time: <self us> | <cumulative us> | <indented module>"
+        self_us, _, name = line[len("import time:"):].split("|")
+        if not self_us.strip().isdigit():
+            continue  # column header
+        totals[_module_group(name.strip())] += int(self_us)
+    return totals
+
+
+def profile_startup(
+    child_args: List[str],
+    target_seconds: float,
+    env: Optional[Dict[str, str]] = None,
+    top: int = 15,
+) -> int:
+    """Profile a cold start; returns a non-zero exit code if over target
+
+    The child runs with exactly ``env`` when given, so callers can remove
+    variables as well as set them.
+    """
+    child_env = env if env is not None else dict(os.environ)
+    started = time.time()
+    child = subprocess.run(
+        [sys.executable, "-X", "importtime", *child_args],
+        env=child_env,
+        capture_output=True,
+        text=True,
+    )
+
+    ready_at = None
+    for line in child.stdout.splitlines():
+        if line.startswith(READY_MARKER):
+            ready_at = float(line.split()[1])
+    if ready_at is None:
+        print(child.stderr[-2000:], file=sys.stderr)
+        print("Service did not become ready", file=sys.stderr)
+        return 1
+
+    totals = import_breakdown(child.stderr)
+    total_imports = sum(totals.values())
+    print(f"{'module':<40} {'self ms':>10} {'share':>7}")
+    for name, micros in sorted(totals.items(), key=lambda item: -item[1])[:top]:
+        print(f"{name:<40} {micros / 1000:>10.1f} {micros / total_imports:>7.1%}")
+    print(f"{'all imports':<40} {total_imports / 1000:>10.1f}")
+
+    ready_seconds = ready_at - started
+    verdict = "OK" if ready_seconds <= target_seconds else "OVER TARGET"
+    print(f"ready in {ready_seconds:.3f}s (target {target_seconds:.3f}s): {verdict}")
+    return 0 if ready_seconds <= target_seconds else 2
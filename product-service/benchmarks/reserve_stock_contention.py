@@ -0,0 +1,135 @@
+"""Contention benchmark for ReserveStock on a single hot product.
+
+Fires many concurrent single-item reservations at one product and reports
+reservations/sec, so changes to the reservation path can be compared. Only
+ReserveStock is measured: no order is stored, so the order insert and the
+rollup upsert that order-service adds per order are not included.
+
+Usage (from product-service/, with stubs generated into proto_gen/):
+
+    # In-process against a throwaway SQLite database
+    PYTHONPATH=.:proto_gen python -m benchmarks.reserve_stock_contention
+
+    # Against a running product-service
+    PYTHONPATH=.:proto_gen python -m benchmarks.reserve_stock_contention \\
+        --target localhost:50051
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+import grpc
+
+
+class _Context:
+    """Minimal stand-in for grpc.aio.ServicerContext"""
+
+    def __init__(self):
+        self.code = grpc.StatusCode.OK
+        self.details = ""
+
+    def set_code(self, code):
+        self.code = code
+
+    def set_details(self, details):
+        self.details = details
+
+
+async def _run(reserve, create_product, args):
+    from proto_gen.product_pb2 import (
+        CreateProductRequest,
+        ReserveStockRequest,
+        StockItem,
+    )
+
+    product = await create_product(CreateProductRequest(
+        name="Hot product",
+        description="Benchmark product",
+        price=9.99,
+        stock=args.reservations * args.quantity
+    ))
+
+    semaphore = asyncio.Semaphore(args.concurrency)
+    failures = 0
+
+    async def reserve_one():
+        nonlocal failures
+        async with semaphore:
+            request = ReserveStockRequest(items=[
+                StockItem(product_id=product.id, quantity=args.quantity)
+            ])
+            if not await reserve(request):
+                failures += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(reserve_one() for _ in range(args.reservations)))
+    elapsed = time.perf_counter() - started
+
+    print(f"reservations:     {args.reservations}")
+    print(f"concurrency:      {args.concurrency}")
+    print(f"failures:         {failures}")
+    print(f"elapsed:          {elapsed:.3f}s")
+    print(f"reservations/sec: {args.reservations / elapsed:.1f}")
+
+
+async def _in_process(args):
+    from app.database import engine, init_db
+    from app.servicer import ProductServicer
+
+    engine.sync_engine.echo = False
+    await init_db()
+    servicer = ProductServicer()
+
+    async def create_product(request):
+        return await servicer.CreateProduct(request, _Context())
+
+    async def reserve(request):
+        context = _Context()
+        await servicer.ReserveStock(request, context)
+        return context.code == grpc.StatusCode.OK
+
+    await _run(reserve, create_product, args)
+    await engine.dispose()
+
+
+async def _remote(args):
+    from proto_gen.product_pb2_grpc import ProductServiceStub
+
+    async with grpc.aio.insecure_channel(args.target) as channel:
+        stub = ProductServiceStub(channel)
+
+        async def reserve(request):
+            try:
+                await stub.ReserveStock(request)
+                return True
+            except grpc.RpcError:
+                return False
+
+        await _run(reserve, stub.CreateProduct, args)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--reservations", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--quantity", type=int, default=1)
+    parser.add_argument(
+        "--target",
+        help="gRPC target of a running product-service; in-process if omitted"
+    )
+    args = parser.parse_args()
+
+    if args.target:
+        asyncio.run(_remote(args))
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Must be set before app.database is imported
+        os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{tmp}/bench.db"
+        asyncio.run(_in_process(args))
+
+
+if __name__ == "__main__":
+    main()
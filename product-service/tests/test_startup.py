@@ -0,0 +1,46 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from app import server, startup
+from app.database import DATABASE_URL
+
+
+def _profile_child_env(monkeypatch, tmp_path):
+    """Run --profile-startup with a stubbed child; returns the child's env"""
+    live_socket = tmp_path / "live.sock"
+    live_socket.touch()
+    monkeypatch.setenv("GRPC_UNIX_SOCKET", str(live_socket))
+    monkeypatch.setattr(sys, "argv", ["app.server", "--profile-startup"])
+    calls = []
+
+    def run(args, env, **kwargs):
+        calls.append(env)
+        return subprocess.CompletedProcess(
+            args, 0, stdout=f"{startup.READY_MARKER} 0\n", stderr=""
+        )
+
+    monkeypatch.setattr(startup.subprocess, "run", run)
+    with pytest.raises(SystemExit):
+        server.main()
+
+    assert live_socket.exists()
+    [env] = calls
+    return env
+
+
+def test_profile_startup_leaves_live_unix_socket_alone(monkeypatch, tmp_path):
+    env = _profile_child_env(monkeypatch, tmp_path)
+
+    assert "GRPC_UNIX_SOCKET" not in env
+    assert env["GRPC_LISTEN_ADDRESS"] == "127.0.0.1:0"
+
+
+def test_profile_startup_uses_throwaway_database(monkeypatch, tmp_path):
+    env = _profile_child_env(monkeypatch, tmp_path)
+
+    assert env["DATABASE_URL"].startswith("sqlite+aiosqlite:///")
+    assert env["DATABASE_URL"] != os.environ["DATABASE_URL"]
+    assert env["DATABASE_URL"] != DATABASE_URL
@@ -0,0 +1,241 @@
+import asyncio
+
+import grpc
+from sqlalchemy import text
+
+from proto_gen.product_pb2 import (
+    CreateProductRequest,
+    GetProductRequest,
+    ReleaseStockRequest,
+    ReserveStockRequest,
+    RestockProductRequest,
+    StockItem,
+)
+from app import migrations
+from app.database import engine, init_db
+from app.servicer import ProductServicer
+from conftest import Context
+
+
+async def _create_product(stock, price=2.5):
+    context = Context()
+    product = await ProductServicer().CreateProduct(
+        CreateProductRequest(name="Widget", description="A widget", price=price, stock=stock),
+        context
+    )
+    assert context.code == grpc.StatusCode.OK, context.details
+    return product.id
+
+
+async def _stock(product_id):
+    product = await ProductServicer().GetProduct(GetProductRequest(id=product_id), Context())
+    return product.stock
+
+
+def _items(*pairs):
+    return [StockItem(product_id=product_id, quantity=quantity) for product_id, quantity in pairs]
+
+
+async def test_reserve_stock_decrements_every_item(db, context):
+    first = await _create_product(stock=5, price=2.5)
+    second = await _create_product(stock=3, price=4.0)
+
+    response = await ProductServicer().ReserveStock(
+        ReserveStockRequest(items=_items((first, 2), (second, 3), (first, 1))),
+        context
+    )
+
+    assert context.code == grpc.StatusCode.OK
+    # Duplicate products are merged into one reservation each
+    reserved = {item.product_id: item for item in response.items}
+    assert len(response.items) == 2
+    assert (reserved[first].quantity, reserved[first].price, reserved[first].remaining_stock) == (3, 2.5, 2)
+    assert (reserved[second].quantity, reserved[second].price, reserved[second].remaining_stock) == (3, 4.0, 0)
+    assert await _stock(first) == 2
+    assert await _stock(second) == 0
+
+
+async def test_reserve_stock_is_all_or_nothing(db, context):
+    plenty = await _create_product(stock=10)
+    scarce = await _create_product(stock=1)
+
+    response = await ProductServicer().ReserveStock(
+        ReserveStockRequest(items=_items((plenty, 4), (scarce, 2))), context
+    )
+
+    assert context.code == grpc.StatusCode.FAILED_PRECONDITION
+    assert context.details == f"Insufficient stock: {scarce}"
+    assert not response.items
+    assert await _stock(plenty) == 10
+    assert await _stock(scarce) == 1
+
+
+async def test_reserve_stock_reports_unknown_product_as_not_found(db, context):
+    product_id = await _create_product(stock=10)
+
+    await ProductServicer().ReserveStock(
+        ReserveStockRequest(items=_items((product_id, 1), ("missing", 1))), context
+    )
+
+    assert context.code == grpc.StatusCode.NOT_FOUND
+    assert context.details == "Product not found: missing"
+    assert await _stock(product_id) == 10
+
+
+async def test_reserve_stock_rejects_invalid_items(db, context):
+    product_id = await _create_product(stock=10)
+
+    await ProductServicer().ReserveStock(
+        ReserveStockRequest(items=_items((product_id, 0))), context
+    )
+
+    assert context.code == grpc.StatusCode.INVALID_ARGUMENT
+    assert await _stock(product_id) == 10
+
+
+async def test_concurrent_reservations_never_oversell(db):
+    product_id = await _create_product(stock=10)
+    servicer = ProductServicer()
+
+    async def reserve():
+        context = Context()
+        await servicer.ReserveStock(
+            ReserveStockRequest(items=_items((product_id, 1))), context
+        )
+        return context.code
+
+    codes = await asyncio.gather(*(reserve() for _ in range(25)))
+
+    assert codes.count(grpc.StatusCode.OK) == 10
+    assert codes.count(grpc.StatusCode.FAILED_PRECONDITION) == 15
+    assert await _stock(product_id) == 0
+
+
+async def test_release_stock_returns_units(db, context):
+    product_id = await _create_product(stock=4)
+    await ProductServicer().ReserveStock(
+        ReserveStockRequest(items=_items((product_id, 3))), Context()
+    )
+
+    response = await ProductServicer().ReleaseStock(
+        ReleaseStockRequest(items=_items((product_id, 3))), context
+    )
+
+    assert context.code == grpc.StatusCode.OK
+    assert response.items[0].remaining_stock == 4
+
+
+async def test_release_stock_for_unknown_product_changes_nothing(db, context):
+    product_id = await _create_product(stock=4)
+
+    await ProductServicer().ReleaseStock(
+        ReleaseStockRequest(items=_items((product_id, 1), ("missing", 1))), context
+    )
+
+    assert context.code == grpc.StatusCode.NOT_FOUND
+    assert await _stock(product_id) == 4
+
+
+async def test_restock_adds_units(db, context):
+    product_id = await _create_product(stock=0)
+
+    product = await ProductServicer().RestockProduct(
+        RestockProductRequest(id=product_id, quantity=7), context
+    )
+
+    assert context.code == grpc.StatusCode.OK
+    assert (product.id, product.name, product.stock) == (product_id, "Widget", 7)
+    assert await _stock(product_id) == 7
+
+
+async def test_restock_unknown_product_is_not_found(db, context):
+    await ProductServicer().RestockProduct(
+        RestockProductRequest(id="missing", quantity=7), context
+    )
+
+    assert context.code == grpc.StatusCode.NOT_FOUND
+
+
+async def test_restock_rejects_non_positive_quantity(db, context):
+    product_id = await _create_product(stock=3)
+
+    await ProductServicer().RestockProduct(
+        RestockProductRequest(id=product_id, quantity=-2), context
+    )
+
+    assert context.code == grpc.StatusCode.INVALID_ARGUMENT
+    assert await _stock(product_id) == 3
+
+
+async def test_create_product_rejects_negative_stock(db, context):
+    await ProductServicer().CreateProduct(
+        CreateProductRequest(name="Widget", description="A widget", price=1.0, stock=-1),
+        context
+    )
+
+    assert context.code == grpc.StatusCode.INVALID_ARGUMENT
+
+
+async def _create_legacy_product():
+    # Product table as it was before stock tracking
+    async with engine.begin() as conn:
+        await conn.execute(text(
+            "CREATE TABLE product (id VARCHAR NOT NULL PRIMARY KEY, "
+            "name VARCHAR NOT NULL, description VARCHAR NOT NULL, price FLOAT NOT NULL)"
+        ))
+        await conn.execute(text(
+            "INSERT INTO product (id, name, description, price) "
+            "VALUES ('legacy', 'Old widget', 'Predates stock', 3.0)"
+        ))
+
+
+async def test_legacy_products_start_out_of_stock(empty_db):
+    await _create_legacy_product()
+
+    await init_db()
+
+    assert await _stock("legacy") == 0
+
+
+async def test_legacy_product_stock_is_configurable(empty_db, monkeypatch):
+    monkeypatch.setattr(migrations, "LEGACY_PRODUCT_STOCK", 25)
+    await _create_legacy_product()
+
+    await init_db()
+
+    assert await _stock("legacy") == 25
+
+
+async def test_partial_reservation_reports_each_item(db, context):
+    first = await _create_product(stock=2, price=2.5)
+    second = await _create_product(stock=5, price=4.0)
+
+    response = await ProductServicer().ReserveStock(
+        ReserveStockRequest(
+            items=_items(
+                (first, 1), ("missing", 1), (first, 2), (second, 0), (second, 5), (first, 1)
+            ),
+            partial=True
+        ),
+        context
+    )
+
+    assert context.code == grpc.StatusCode.OK
+    assert [(item.product_id, item.code, item.message) for item in response.items] == [
+        (first, grpc.StatusCode.OK.value[0], ""),
+        ("missing", grpc.StatusCode.NOT_FOUND.value[0], "Product not found"),
+        # Items of one product are reserved in request order
+        (first, grpc.StatusCode.FAILED_PRECONDITION.value[0], "Insufficient stock"),
+        (second, grpc.StatusCode.INVALID_ARGUMENT.value[0], "Invalid stock item"),
+        (second, grpc.StatusCode.OK.value[0], ""),
+        (first, grpc.StatusCode.OK.value[0], ""),
+    ]
+    assert [item.price for item in response.items if item.code == 0] == [2.5, 4.0, 2.5]
+    assert await _stock(first) == 0
+    assert await _stock(second) == 0
+
+
+async def test_partial_reservation_requires_items(db, context):
+    await ProductServicer().ReserveStock(ReserveStockRequest(partial=True), context)
+
+    assert context.code == grpc.StatusCode.INVALID_ARGUMENT